@@ -1,9 +1,37 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QTextEdit, QLineEdit, QLabel, QWidget)
-from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
-from PyQt5.QtCore import QIODevice
+                             QPushButton, QPlainTextEdit, QLineEdit, QLabel, QWidget)
+from PyQt5.QtSerialPort import QSerialPortInfo
+from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QFont
+from at_transport import ATTransport
+from band_manager import BandManager, band_target
+from response_spool import execute_spooled
+from output_sink import QtOutputSink
+
+
+class CommandWorker(QThread):
+    result_received = pyqtSignal(str)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, transport, command, band_manager=None):
+        super().__init__()
+        self.transport = transport
+        self.command = command
+        self.band_manager = band_manager
+
+    def run(self):
+        try:
+            target = band_target(self.command)
+            if target is not None and self.band_manager:
+                # Повторная запись того же диапазона вызывает лишнюю перерегистрацию
+                self.result_received.emit(self.band_manager.apply(target).describe())
+            else:
+                # Длинный дамп не вставляется в окно целиком, только начало, конец и путь к файлу
+                self.result_received.emit(execute_spooled(self.transport, self.command)[1].text())
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
 
 class ATCommandSender(QMainWindow):
     def __init__(self):
@@ -12,9 +40,9 @@ class ATCommandSender(QMainWindow):
         self.setGeometry(100, 100, 800, 700)
         
         # Serial port setup
-        self.serial = QSerialPort()
-        self.serial.setBaudRate(115200)
-        self.serial.readyRead.connect(self.read_data)
+        self.transport = None
+        self.band_manager = None
+        self.worker = None
         
         # UI setup
         self.init_ui()
@@ -89,8 +117,9 @@ class ATCommandSender(QMainWindow):
         main_layout.addLayout(custom_layout)
         
         # Output area
-        self.output_area = QTextEdit()
+        self.output_area = QPlainTextEdit()
         self.output_area.setReadOnly(True)
+        self.output_sink = QtOutputSink(self.output_area)
         
         # Set Hack font
         hack_font = QFont("Hack", 10)
@@ -120,49 +149,60 @@ class ATCommandSender(QMainWindow):
         self.custom_cmd_input.setEnabled(enabled)
         
     def toggle_connection(self):
-        if self.serial.isOpen():
-            self.serial.close()
+        if self.transport and self.transport.is_open:
+            self.transport.close()
+            self.transport = None
+            self.band_manager = None
             self.connect_btn.setText("Connect")
             self.set_buttons_enabled(False)
             self.append_output("Disconnected from COM port")
         else:
             #port_name = self.port_combo.currentText()
             port_name = self.port_combo.currentData()
-            self.serial.setPortName(port_name)
-            if self.serial.open(QIODevice.ReadWrite):
+            try:
+                self.transport = ATTransport(port_name).open()
+                self.band_manager = BandManager(self.transport)
                 self.connect_btn.setText("Disconnect")
                 self.set_buttons_enabled(True)
                 self.append_output(f"Connected to {port_name}")
-            else:
-                self.append_output(f"Failed to open {port_name}")
+            except Exception as e:
+                self.transport = None
+                self.append_output(f"Failed to open {port_name}: {e}")
                 
     def send_command(self, cmd):
-        if self.serial.isOpen():
-            self.append_output(f"> {cmd}")
-            self.serial.write((cmd + "\r\n").encode())
-        else:
+        if not (self.transport and self.transport.is_open):
             self.append_output("Not connected to COM port")
+            return
+        if self.worker and self.worker.isRunning():
+            self.append_output("Please wait for the current command to finish")
+            return
+        self.append_output(f"> {cmd}")
+        self.worker = CommandWorker(self.transport, cmd, self.band_manager)
+        self.worker.result_received.connect(self.read_data)
+        self.worker.error_occurred.connect(lambda error: self.append_output(f"Error: {error}"))
+        self.worker.start()
             
     def send_custom_command(self):
         cmd = self.custom_cmd_input.text().strip()
         if cmd:
             self.send_command(cmd)
             
-    def read_data(self):
-        while self.serial.canReadLine():
-            data = self.serial.readLine().data().decode().strip()
+    def read_data(self, response):
+        for data in response.splitlines():
             self.append_output(f"{data}")
             
     def clear_output(self):
         """Clear the output text area"""
-        self.output_area.clear()
+        self.output_sink.clear()
 
     def append_output(self, text):
-        self.output_area.append(text)
+        self.output_sink.append(text)
         
     def closeEvent(self, event):
-        if self.serial.isOpen():
-            self.serial.close()
+        if self.worker and self.worker.isRunning():
+            self.worker.wait()
+        if self.transport:
+            self.transport.close()
         event.accept()
 
 # QComboBox wasn't imported in the original code, so we need to add it
@@ -3,6 +3,16 @@ from tkinter import ttk
 import serial
 import serial.tools.list_ports
 from tkinter import font
+from at_transport import ATTransport, DEFAULT_BAUDRATE
+from autobaud import detect_baudrate
+from serial_reader import TkDispatcher
+from band_manager import BandManager, band_target
+from output_sink import TkOutputSink
+from status_model import StatusModel, format_rtt, format_rate
+from modem_console import ModemConsole
+from port_roles import RoleCache, find_at_port
+from response_spool import execute_spooled
+import threading
 
 class ATCommandSender:
     def __init__(self, root):
@@ -10,14 +20,19 @@ class ATCommandSender:
         self.root.title("Modem Setup v.2")
         self.root.geometry("800x700+100+100")
 
-        self.serial_port = None
-        self.baud_rate = 115200
+        self.transport = None
+        self.band_manager = None
+        self.dispatcher = TkDispatcher(self.root)
+        self.baud_rate = DEFAULT_BAUDRATE
         self.selected_port = tk.StringVar(value="Не выбран")
-        self.connection_status = tk.StringVar(value="Отключено")
-        self.last_command = tk.StringVar(value="Нет")
+        self.status = StatusModel()
+        self.status_redraw_pending = False
 
         self.init_ui()
-        self.update_status_bar()
+        # Строка состояния перерисовывается только при изменении модели
+        self.selected_port.trace_add("write", lambda *args: self.status.set(port=self.selected_port.get()))
+        self.status.set(port=self.selected_port.get())
+        self.status.subscribe(self.on_status_changed)
 
     def init_ui(self):
         main_frame = ttk.Frame(self.root, padding=10)
@@ -37,15 +52,17 @@ class ATCommandSender:
         if port_list_with_descriptions:
             self.selected_port.set(port_list_with_descriptions[0].split(' - ')[0] if port_list_with_descriptions else "Не выбран")
 
-        default_port = "COM13"
-        available_port_names = [port.device for port in ports_info]
-
-        if default_port in available_port_names:
+        # AT-порт, запомненный для этого модема по серийному номеру USB
+        default_port = RoleCache().find_at_port(ports_info)
+        if default_port:
             self.selected_port.set(default_port)
 
         self.connect_btn = ttk.Button(port_frame, text="Connect", command=self.toggle_connection)
         self.connect_btn.grid(row=0, column=2, padx=5, pady=5)
 
+        self.find_at_btn = ttk.Button(port_frame, text="Find AT port", command=self.find_at_port)
+        self.find_at_btn.grid(row=0, column=3, padx=5, pady=5)
+
         port_frame.columnconfigure(1, weight=1)
 
         # Command buttons
@@ -96,6 +113,9 @@ class ATCommandSender:
         hack_font = font.Font(family="Hack", size=10)
         self.output_area.config(font=hack_font)
         self.output_area.pack(fill=tk.BOTH, expand=True)
+        self.output_sink = TkOutputSink(self.output_area)
+        # Приём и вывод без tkinter: тот же код работает в session_replay без окна
+        self.console = ModemConsole(self.dispatcher, self.output_sink, self.status)
 
         # Clear button
         self.clear_btn = ttk.Button(main_frame, text="Clear Output", command=self.clear_output)
@@ -108,9 +128,46 @@ class ATCommandSender:
         # Disable buttons initially
         self.set_buttons_enabled(False)
 
+    def on_status_changed(self, model, changed):
+        if not self.status_redraw_pending:
+            self.status_redraw_pending = True
+            self.root.after_idle(self.update_status_bar)
+
     def update_status_bar(self):
-        self.status_bar.config(text=f"Порт: {self.selected_port.get()} | Статус: {self.connection_status.get()} | Последняя команда: {self.last_command.get()}")
-        self.root.after(100, self.update_status_bar)
+        self.status_redraw_pending = False
+        status = self.status
+        connection = "Подключено" if status.connected else "Отключено"
+        self.status_bar.config(text=f"Порт: {status.port} | Статус: {connection} | Последняя команда: {status.last_command or 'Нет'}"
+                                    f" | RTT: {format_rtt(status.rtt)} | Скорость: {format_rate(status.throughput)}")
+
+    def find_at_port(self):
+        if self.transport and self.transport.is_open:
+            self.append_output("Disconnect before searching for the AT port")
+            return
+        self.find_at_btn.config(state=tk.DISABLED)
+        self.append_output("Probing modem interfaces...")
+        # Опрос интерфейсов идёт в фоне, результат возвращается через dispatcher
+        threading.Thread(target=self._find_at_port, daemon=True).start()
+
+    def _find_at_port(self):
+        device = find_at_port()
+        rate = None
+        if device:
+            try:
+                rate = detect_baudrate(device, preferred=self.baud_rate)
+            except serial.SerialException:
+                pass
+        self.dispatcher.call_soon(self.on_at_port_found, device, rate)
+
+    def on_at_port_found(self, device, rate=None):
+        self.find_at_btn.config(state=tk.NORMAL)
+        if device:
+            self.selected_port.set(device)
+            if rate:
+                self.baud_rate = rate
+            self.append_output(f"AT port: {device}" + (f", {rate} baud" if rate else ""))
+        else:
+            self.append_output("No port answered AT")
 
     def clear_placeholder(self, event):
         if self.custom_cmd_input.get() == "Enter custom AT command":
@@ -131,73 +188,80 @@ class ATCommandSender:
 
     def toggle_connection(self):
         selected_port = self.port_combo.get().split(' - ')[0] if self.port_combo.get() else None
-        if self.serial_port and self.serial_port.is_open:
+        if self.transport and self.transport.is_open:
             try:
-                self.serial_port.close()
-                self.serial_port = None
+                self.stop_reader()
+                self.transport.close()
+                self.transport = None
+                self.band_manager = None
                 self.connect_btn.config(text="Connect")
                 self.set_buttons_enabled(False)
-                self.connection_status.set("Отключено")
+                self.status.set(connected=False)
                 self.append_output("Disconnected from COM port")
             except serial.SerialException as e:
                 self.append_output(f"Error disconnecting: {e}")
         elif selected_port:
             try:
-                self.serial_port = serial.Serial(selected_port, self.baud_rate, timeout=0.1)
+                self.transport = ATTransport(selected_port, self.baud_rate).open()
+                self.band_manager = BandManager(self.transport)
                 self.connect_btn.config(text="Disconnect")
                 self.set_buttons_enabled(True)
-                self.connection_status.set("Подключено")
+                self.status.set(connected=True)
                 self.append_output(f"Connected to {selected_port}")
-                self.root.after(100, self.read_data)  # Start reading data periodically
+                self.start_reader()
             except serial.SerialException as e:
                 self.append_output(f"Failed to open {selected_port}: {e}")
-                self.serial_port = None
-                self.connection_status.set("Отключено")
+                self.transport = None
+                self.status.set(connected=False)
         else:
             self.append_output("Please select a COM port.")
 
     def _send_command(self, cmd):
-        if self.serial_port and self.serial_port.is_open:
-            self.append_output(f"> {cmd}")
-            self.last_command.set(cmd)
-            try:
-                self.serial_port.write((cmd + "\r\n").encode())
-            except serial.SerialException as e:
-                self.append_output(f"Error sending command: {e}")
+        if self.transport and self.transport.is_open:
+            self.console.command_sent(cmd)
+            # Ответ собирается в рабочем потоке, большой уходит во временный файл
+            threading.Thread(target=self._execute, args=(self.transport, self.band_manager, cmd), daemon=True).start()
         else:
             self.append_output("Not connected to COM port")
 
+    def _execute(self, transport, band_manager, cmd):
+        try:
+            target = band_target(cmd)
+            if target is not None and band_manager:
+                # Повторная запись того же диапазона вызывает лишнюю перерегистрацию
+                self.dispatcher.call_soon(self.console.show_result, band_manager.apply(target).describe())
+            else:
+                self.dispatcher.call_soon(self.console.show_response, execute_spooled(transport, cmd)[1])
+        except Exception as e:
+            self.dispatcher.call_soon(self.append_output, f"Error sending command: {e}")
+
     def send_custom_command(self):
         cmd = self.custom_cmd_input.get().strip()
         if cmd and cmd != "Enter custom AT command":
             self._send_command(cmd)
 
-    def read_data(self):
-        if self.serial_port and self.serial_port.is_open:
-            try:
-                while self.serial_port.in_waiting:
-                    data = self.serial_port.readline().decode().strip()
-                    if data:
-                        self.append_output(f"{data}")
-            except serial.SerialException as e:
-                self.append_output(f"Error reading data: {e}")
-                self.toggle_connection() # Disconnect on error
-        self.root.after(100, self.read_data) # Continue checking for data
+    def start_reader(self):
+        self.console.start_reader(self.transport, self.on_read_error)
+
+    def stop_reader(self):
+        if self.transport:
+            self.console.stop_reader(self.transport)
+
+    def on_read_error(self, e):
+        self.append_output(f"Error reading data: {e}")
+        if self.transport and self.transport.is_open:
+            self.toggle_connection() # Disconnect on error
 
     def clear_output(self):
-        self.output_area.config(state=tk.NORMAL)
-        self.output_area.delete(1.0, tk.END)
-        self.output_area.config(state=tk.DISABLED)
+        self.console.clear_output()
 
     def append_output(self, text):
-        self.output_area.config(state=tk.NORMAL)
-        self.output_area.insert(tk.END, text + "\n")
-        self.output_area.see(tk.END)  # Autoscroll to the bottom
-        self.output_area.config(state=tk.DISABLED)
+        self.console.append_output(text)
 
     def on_closing(self):
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+        self.stop_reader()
+        if self.transport:
+            self.transport.close()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+# at_metrics.py
+import re
+import threading
+
+# Границы гистограммы задержки, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_METRICS_PORT = 9105
+
+VERB_RE = re.compile(r"^AT(?:([+!#$%^*@][A-Z0-9_]+)|(&?[A-Z]?))", re.I)
+
+
+def command_verb(command):
+    """AT!BAND=09 -> AT!BAND, AT!GSTATUS? -> AT!GSTATUS, ATI0 -> ATI"""
+    match = VERB_RE.match(command.strip())
+    if not match:
+        return "OTHER"
+    return ("AT" + (match.group(1) or match.group(2))).upper()
+
+
+class CommandStats:
+    """Counters and latency histogram of one command verb"""
+
+    __slots__ = ("buckets", "count", "latency_sum", "timeouts", "errors", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.timeouts = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def observe(self, elapsed, timed_out, error, bytes_out, bytes_in):
+        index = 0
+        while index < len(LATENCY_BUCKETS) and elapsed > LATENCY_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.latency_sum += elapsed
+        self.timeouts += timed_out
+        self.errors += error
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "latency_sum": self.latency_sum,
+            "latency_avg": self.latency_sum / self.count if self.count else None,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+class MetricsRegistry:
+    """Per-verb command statistics shared by every transport in the process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = {}
+
+    def observe(self, command, elapsed, timed_out=False, error=False, bytes_out=0, bytes_in=0):
+        verb = command_verb(command)
+        with self.lock:
+            stats = self.commands.get(verb)
+            if stats is None:
+                stats = self.commands[verb] = CommandStats()
+            stats.observe(elapsed, bool(timed_out), bool(error), bytes_out, bytes_in)
+
+    def snapshot(self):
+        with self.lock:
+            return {verb: stats.as_dict() for verb, stats in self.commands.items()}
+
+    def reset(self):
+        with self.lock:
+            self.commands.clear()
+
+    def render_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        out = [
+            "# HELP modem_command_duration_seconds Time from sending a command to its final result code",
+            "# TYPE modem_command_duration_seconds histogram",
+        ]
+        snapshot = self.snapshot()
+        for verb, stats in sorted(snapshot.items()):
+            label = verb.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in stats["buckets"].items():
+                cumulative += count
+                out.append(f'modem_command_duration_seconds_bucket{{verb="{label}",le="{bound}"}} {cumulative}')
+            out.append(f'modem_command_duration_seconds_sum{{verb="{label}"}} {stats["latency_sum"]:.6f}')
+            out.append(f'modem_command_duration_seconds_count{{verb="{label}"}} {stats["count"]}')
+        for name, key, help_text in (
+            ("modem_command_timeouts_total", "timeouts", "Commands without a final result code in time"),
+            ("modem_command_errors_total", "errors", "Commands that ended with ERROR or +CME/+CMS ERROR"),
+            ("modem_command_bytes_in_total", "bytes_in", "Bytes received in command responses"),
+            ("modem_command_bytes_out_total", "bytes_out", "Bytes of commands written to the port"),
+        ):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} counter")
+            for verb, stats in sorted(snapshot.items()):
+                label = verb.replace("\\", "\\\\").replace('"', '\\"')
+                out.append(f'{name}{{verb="{label}"}} {stats[key]}')
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_http_server(port=DEFAULT_METRICS_PORT, host="127.0.0.1", registry=REGISTRY):
+    """Serve /metrics in Prometheus format from a daemon thread, returns the server"""
+    # http.server тянет email и ssl, импортируем только когда сервер действительно нужен
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
@@ -0,0 +1,195 @@
+# at_orchestrator.py
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from at_transport import ATTransport, DEFAULT_BAUDRATE, DEFAULT_COMMAND_TIMEOUT
+from at_script import ScriptStep, ScriptError, load_script
+from autobaud import detect_baudrate, negotiate_baudrate, restore_baudrate
+
+
+class ModemResult:
+    """Outcome of a command sequence on one modem"""
+
+    def __init__(self, port):
+        self.port = port
+        self.responses = []
+        self.failures = []
+        self.error = None
+        self.baudrate = None
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None and not self.failures
+
+    def to_dict(self):
+        return {
+            "port": self.port,
+            "ok": self.ok,
+            "error": self.error,
+            "baudrate": self.baudrate,
+            "failures": self.failures,
+            "elapsed": round(self.elapsed, 4),
+            "responses": [
+                {
+                    "command": response.command,
+                    "final": response.final,
+                    "lines": response.lines,
+                    "elapsed": round(response.elapsed, 4),
+                }
+                for response in self.responses
+            ],
+        }
+
+
+class ModemOrchestrator:
+    """Runs command sequences on many modems concurrently"""
+
+    def __init__(self, ports, baudrate=DEFAULT_BAUDRATE, stop_on_error=False, max_baudrate=None):
+        self.ports = list(ports)
+        # None - определить скорость каждого модема автоматически
+        self.baudrate = baudrate
+        self.stop_on_error = stop_on_error
+        # Поднять скорость через AT+IPR на время прогона, потом вернуть прежнюю
+        self.max_baudrate = max_baudrate
+        # pyserial блокирующий, поэтому каждому модему - свой поток
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.ports)),
+                                           thread_name_prefix="modem")
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def run_modem(self, port, steps):
+        result = ModemResult(port)
+        started = time.monotonic()
+        transport = ATTransport(port, self.baudrate or DEFAULT_BAUDRATE)
+        initial_rate = None
+        try:
+            if self.baudrate is None:
+                rate = await self._call(detect_baudrate, port)
+                if rate is None:
+                    raise ConnectionError("no AT response at any baud rate")
+                transport.set_baudrate(rate)
+            await self._call(transport.open)
+            if self.max_baudrate:
+                initial_rate = transport.baudrate
+                await self._call(negotiate_baudrate, transport, self.max_baudrate)
+            result.baudrate = transport.baudrate
+            for step in steps:
+                response = await self._call(transport.execute, step.command, step.timeout)
+                result.responses.append(response)
+                failure = step.check(response)
+                if failure:
+                    result.failures.append(f"{step.command}: {failure}")
+                    if self.stop_on_error:
+                        break
+        except Exception as e:
+            result.error = str(e)
+        finally:
+            if initial_rate is not None:
+                try:
+                    await self._call(restore_baudrate, transport, initial_rate)
+                except Exception as e:
+                    result.error = result.error or f"restoring {initial_rate} baud: {e}"
+            await self._call(transport.close)
+            result.elapsed = time.monotonic() - started
+        return result
+
+    async def run(self, steps):
+        """Run the same steps on every port, results keep the port order"""
+        try:
+            return await asyncio.gather(*(self.run_modem(port, steps) for port in self.ports))
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def run_commands(ports, commands, timeout=DEFAULT_COMMAND_TIMEOUT, **kwargs):
+    steps = [ScriptStep(command, timeout) for command in commands]
+    return run_steps(ports, steps, **kwargs)
+
+
+def run_steps(ports, steps, **kwargs):
+    return asyncio.run(ModemOrchestrator(ports, **kwargs).run(steps))
+
+
+def read_ports_file(path):
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def print_results(results, out=sys.stdout):
+    for result in results:
+        status = "OK" if result.ok else "FAIL"
+        out.write(f"== {result.port} [{status}] {result.elapsed:.3f}s\n")
+        if result.error:
+            out.write(f"Error: {result.error}\n")
+        for failure in result.failures:
+            out.write(f"Failed: {failure}\n")
+        for response in result.responses:
+            out.write(f"> {response.command}\n")
+            for line in response.lines:
+                out.write(f"{line}\n")
+            if response.timed_out:
+                out.write("Timeout\n")
+
+
+def baudrate_arg(value):
+    return None if value == "auto" else int(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Send AT commands to many modems at once")
+    parser.add_argument("commands", nargs="*", help="AT commands to run on every modem")
+    parser.add_argument("-s", "--script", help="script file to run instead of commands")
+    parser.add_argument("-p", "--port", action="append", default=[], dest="ports",
+                        help="serial port, can be repeated")
+    parser.add_argument("--ports-file", help="file with one port per line")
+    parser.add_argument("-b", "--baudrate", type=baudrate_arg, default=DEFAULT_BAUDRATE,
+                        help="port speed or 'auto' to detect it per modem")
+    parser.add_argument("--max-baudrate", type=int,
+                        help="raise the link up to this rate with AT+IPR for the run")
+    parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_COMMAND_TIMEOUT,
+                        help="per-command timeout in seconds")
+    parser.add_argument("--stop-on-error", action="store_true",
+                        help="skip the rest of a modem's commands after a failure")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ports = list(args.ports)
+    if args.ports_file:
+        ports += read_ports_file(args.ports_file)
+    if not ports:
+        print("Error: no ports given", file=sys.stderr)
+        return 2
+
+    if args.script:
+        try:
+            steps = load_script(args.script, args.timeout)
+        except (OSError, ScriptError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+    else:
+        steps = [ScriptStep(command, args.timeout) for command in args.commands]
+    if not steps:
+        print("Error: no commands given", file=sys.stderr)
+        return 2
+
+    results = run_steps(ports, steps, baudrate=args.baudrate, stop_on_error=args.stop_on_error,
+                        max_baudrate=args.max_baudrate)
+    if args.json:
+        json.dump([result.to_dict() for result in results], sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print_results(results)
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
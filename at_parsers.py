@@ -0,0 +1,331 @@
+# at_parsers.py
+import re
+from abc import ABC, abstractmethod
+from array import array
+from at_transport import is_final_result
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int_hex(value):
+    try:
+        return int(value, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def _leading_number(value):
+    """First number in a value such as "20 MHz" or "-93"""
+    match = re.match(r"\s*(-?\d+(?:\.\d+)?)", value or "")
+    return float(match.group(1)) if match else None
+
+
+def _leading_int(value):
+    """Leading integer of a value such as "2450" or "19850 (B4)", None if there is none"""
+    match = re.match(r"\s*(-?\d+)", value or "")
+    return int(match.group(1)) if match else None
+
+
+class LineParser(ABC):
+    """Consumes response lines one at a time, result() returns the typed record"""
+
+    def __init__(self):
+        self.done = False
+        self.final = None
+
+    def feed(self, line):
+        line = line.strip()
+        if self.done or not line:
+            return
+        if is_final_result(line):
+            self.done = True
+            self.final = line
+            return
+        self._feed(line)
+
+    def feed_lines(self, lines):
+        for line in lines:
+            self.feed(line)
+        return self.result()
+
+    @abstractmethod
+    def _feed(self, line):
+        """Handle one non-empty line that is not a final result code"""
+
+    @abstractmethod
+    def result(self):
+        """The typed record built from the lines fed so far"""
+
+
+# --- AT!GSTATUS? ---
+
+class GStatus:
+    """Typed AT!GSTATUS? record, the whole reply fits in a few dozen bytes of slots"""
+
+    __slots__ = ("temperature", "mode", "system_mode", "ps_state", "lte_band", "lte_bw",
+                 "rx_chan", "tx_chan", "emm_state", "rrc_state", "rssi_rxm", "rssi_rxd",
+                 "rsrp_rxm", "rsrp_rxd", "rsrq", "sinr", "tac", "cell_id", "tx_power")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+
+    @property
+    def rsrp(self):
+        values = [value for value in (self.rsrp_rxm, self.rsrp_rxd) if value is not None]
+        return max(values) if values else None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"GStatus(band={self.lte_band!r}, rsrp={self.rsrp}, rsrq={self.rsrq}, sinr={self.sinr})"
+
+
+class GStatusParser(LineParser):
+    """Parses "Key: value" pairs of AT!GSTATUS?, several pairs per line separated by tabs"""
+
+    NUMBER_KEYS = {
+        "Temperature": "temperature",
+        "RSRQ (dB)": "rsrq",
+        "SINR (dB)": "sinr",
+        "Tx Power": "tx_power",
+        "LTE bw": "lte_bw",
+    }
+    # Номера каналов (EARFCN) - целые
+    INT_KEYS = {
+        "LTE Rx chan": "rx_chan",
+        "LTE Tx chan": "tx_chan",
+    }
+    TEXT_KEYS = {
+        "Mode": "mode",
+        "System mode": "system_mode",
+        "PS state": "ps_state",
+        "LTE band": "lte_band",
+        "EMM state": "emm_state",
+        "RRC state": "rrc_state",
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.record = GStatus()
+        self.last_rssi = None
+
+    def _feed(self, line):
+        if line.startswith("!GSTATUS"):
+            return
+        for chunk in line.split("\t"):
+            key, sep, value = chunk.partition(":")
+            if sep:
+                self._store(key.strip(), value.strip())
+
+    def _store(self, key, value):
+        record = self.record
+        if key in self.NUMBER_KEYS:
+            setattr(record, self.NUMBER_KEYS[key], _leading_number(value))
+        elif key in self.INT_KEYS:
+            setattr(record, self.INT_KEYS[key], _leading_int(value))
+        elif key in self.TEXT_KEYS:
+            setattr(record, self.TEXT_KEYS[key], value.split("  ")[0] or None)
+        elif key.endswith("RSSI"):
+            # RSRP в ответе идёт после RSSI того же приёмника (RxM/RxD)
+            self.last_rssi = "rxd" if "RxD" in key else "rxm"
+            setattr(record, f"rssi_{self.last_rssi}", _leading_number(value))
+        elif key == "RSRP (dBm)":
+            setattr(record, f"rsrp_{self.last_rssi or 'rxm'}", _leading_number(value))
+        elif key in ("TAC", "Cell ID"):
+            hex_value = value.split()[0] if value.split() else ""
+            setattr(record, "tac" if key == "TAC" else "cell_id", _to_int_hex(hex_value))
+
+    def result(self):
+        return self.record
+
+
+# --- AT!LTEINFO ---
+
+class ServingCell:
+    __slots__ = ("earfcn", "mcc", "mnc", "tac", "cell_id", "band", "dl_bw", "ul_bw",
+                 "snr", "pci", "rsrq", "rsrp", "rssi", "rxlv")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ServingCell(earfcn={self.earfcn}, pci={self.pci}, band={self.band}, rsrp={self.rsrp})"
+
+
+class NeighbourCells:
+    """Neighbour cell measurements stored column-wise in compact arrays"""
+
+    __slots__ = ("earfcn", "pci", "rsrq", "rsrp", "rssi")
+
+    def __init__(self):
+        self.earfcn = array("l")
+        self.pci = array("h")
+        self.rsrq = array("f")
+        self.rsrp = array("f")
+        self.rssi = array("f")
+
+    def append(self, earfcn, pci, rsrq, rsrp, rssi):
+        self.earfcn.append(earfcn if earfcn is not None else -1)
+        self.pci.append(pci if pci is not None else -1)
+        self.rsrq.append(rsrq if rsrq is not None else float("nan"))
+        self.rsrp.append(rsrp if rsrp is not None else float("nan"))
+        self.rssi.append(rssi if rssi is not None else float("nan"))
+
+    def __len__(self):
+        return len(self.pci)
+
+    def __iter__(self):
+        return zip(self.earfcn, self.pci, self.rsrq, self.rsrp, self.rssi)
+
+
+class LteInfo:
+    __slots__ = ("serving", "intra", "inter")
+
+    def __init__(self):
+        self.serving = None
+        self.intra = NeighbourCells()
+        self.inter = NeighbourCells()
+
+    def __repr__(self):
+        return f"LteInfo(serving={self.serving!r}, intra={len(self.intra)}, inter={len(self.inter)})"
+
+
+class LteInfoParser(LineParser):
+    """Parses the header/value tables of AT!LTEINFO as lines arrive"""
+
+    SERVING_COLUMNS = {
+        "EARFCN": ("earfcn", _to_int), "MCC": ("mcc", _to_int), "MNC": ("mnc", _to_int),
+        "TAC": ("tac", _to_int), "CID": ("cell_id", _to_int_hex), "Bd": ("band", _to_int),
+        "D": ("dl_bw", _to_int), "U": ("ul_bw", _to_int), "SNR": ("snr", _to_float),
+        "PCI": ("pci", _to_int), "RSRQ": ("rsrq", _to_float), "RSRP": ("rsrp", _to_float),
+        "RSSI": ("rssi", _to_float), "RXLV": ("rxlv", _to_float),
+    }
+    SECTIONS = ("Serving", "IntraFreq", "InterFreq")
+
+    def __init__(self):
+        super().__init__()
+        self.record = LteInfo()
+        self.section = None
+        self.columns = []
+
+    def _feed(self, line):
+        if line.startswith("!LTEINFO"):
+            return
+        head, sep, rest = line.partition(":")
+        if sep and " " not in head:
+            # Новая секция: "Serving:   EARFCN MCC ..." - заголовок таблицы
+            self.section = head if head in self.SECTIONS else None
+            self.columns = rest.split()
+            return
+        if self.section is None or not self.columns:
+            return
+        values = line.split()
+        # Для IntraFreq значения выровнены по правым столбцам заголовка
+        row = dict(zip(self.columns[-len(values):], values)) if len(values) <= len(self.columns) else {}
+        if self.section == "Serving":
+            self._serving(row)
+        elif self.section == "IntraFreq":
+            earfcn = self.record.serving.earfcn if self.record.serving else None
+            self._neighbour(self.record.intra, row, earfcn)
+        else:
+            self._neighbour(self.record.inter, row, _to_int(row.get("EARFCN")))
+
+    def _serving(self, row):
+        cell = ServingCell()
+        for column, value in row.items():
+            if column in self.SERVING_COLUMNS:
+                name, convert = self.SERVING_COLUMNS[column]
+                setattr(cell, name, convert(value))
+        self.record.serving = cell
+
+    def _neighbour(self, cells, row, earfcn):
+        if "PCI" not in row:
+            return
+        cells.append(earfcn, _to_int(row["PCI"]), _to_float(row.get("RSRQ")),
+                     _to_float(row.get("RSRP")), _to_float(row.get("RSSI")))
+
+    def result(self):
+        return self.record
+
+
+# --- AT!BAND? / AT!BAND=? ---
+
+class BandEntry:
+    __slots__ = ("index", "name", "gw_mask", "lte_mask", "tds_mask")
+
+    def __init__(self, index, name, gw_mask, lte_mask, tds_mask=0):
+        self.index = index
+        self.name = name
+        self.gw_mask = gw_mask
+        self.lte_mask = lte_mask
+        self.tds_mask = tds_mask
+
+    def lte_bands(self):
+        """LTE band numbers enabled in the mask, bit 0 is band 1"""
+        mask = self.lte_mask
+        return [bit + 1 for bit in range(mask.bit_length()) if mask >> bit & 1]
+
+    def __repr__(self):
+        return f"BandEntry({self.index:02X}, {self.name!r})"
+
+
+class BandParser(LineParser):
+    """Parses band profile rows; AT!BAND? yields one entry, AT!BAND=? the whole list"""
+
+    ROW_RE = re.compile(r"^([0-9A-Fa-f]{2}),\s*(.*?)\s+([0-9A-Fa-f]{16})\s+([0-9A-Fa-f]{16})(?:\s+([0-9A-Fa-f]{16}))?\s*$")
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+
+    def _feed(self, line):
+        match = self.ROW_RE.match(line)
+        if not match:
+            return
+        index, name, gw, lte, tds = match.groups()
+        self.entries.append(BandEntry(int(index, 16), name.rstrip(", "), int(gw, 16), int(lte, 16),
+                                      int(tds, 16) if tds else 0))
+
+    def result(self):
+        return self.entries
+
+    def current(self):
+        return self.entries[0] if self.entries else None
+
+
+PARSERS = {
+    "AT!GSTATUS?": GStatusParser,
+    "AT!LTEINFO": LteInfoParser,
+    "AT!LTEINFO?": LteInfoParser,
+    "AT!BAND?": BandParser,
+    "AT!BAND=?": BandParser,
+}
+
+
+def parser_for(command):
+    """New parser for the command's response, or None if the command has no typed form"""
+    parser_class = PARSERS.get(command.strip().upper())
+    return parser_class() if parser_class else None
+
+
+def parse_response(command, lines):
+    parser = parser_for(command)
+    return parser.feed_lines(lines) if parser else None
@@ -0,0 +1,159 @@
+# at_script.py
+import argparse
+import json
+import re
+import sys
+from at_transport import ATTransport, DEFAULT_BAUDRATE, DEFAULT_COMMAND_TIMEOUT
+
+# Директивы в конце строки: AT!BAND=09 @timeout=30 @expect=OK @match=Index
+DIRECTIVE_RE = re.compile(r"\s+@(timeout|expect|match)=(\S+)\s*$")
+
+
+class ScriptError(Exception):
+    pass
+
+
+class ScriptStep:
+    """One command of a script with its timeout and expected result"""
+
+    def __init__(self, command, timeout=DEFAULT_COMMAND_TIMEOUT, expect="OK", match=None, line_no=0):
+        self.command = command
+        self.timeout = timeout
+        # Ожидаемый финальный код, "any" - любой
+        self.expect = expect
+        self.match = re.compile(match) if match else None
+        self.line_no = line_no
+
+    def check(self, response):
+        """Return None if the response passes, otherwise the reason it failed"""
+        if response.timed_out:
+            return f"no final result within {self.timeout}s"
+        if self.expect != "any" and response.final != self.expect:
+            return f"expected {self.expect}, got {response.final}"
+        if self.match and not any(self.match.search(line) for line in response.lines):
+            return f"no line matches {self.match.pattern!r}"
+        return None
+
+
+class StepResult:
+    def __init__(self, step, response=None, error=None):
+        self.step = step
+        self.response = response
+        self.error = error
+
+    @property
+    def passed(self):
+        return self.error is None
+
+    def to_dict(self):
+        response = self.response
+        return {
+            "line": self.step.line_no,
+            "command": self.step.command,
+            "passed": self.passed,
+            "error": self.error,
+            "final": response.final if response else None,
+            "lines": response.lines if response else [],
+            "elapsed": round(response.elapsed, 4) if response else None,
+        }
+
+
+def parse_script(text, default_timeout=DEFAULT_COMMAND_TIMEOUT):
+    steps = []
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        options = {"timeout": default_timeout, "expect": "OK", "match": None}
+        while True:
+            directive = DIRECTIVE_RE.search(line)
+            if not directive:
+                break
+            name, value = directive.groups()
+            if name == "timeout":
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise ScriptError(f"line {line_no}: bad timeout {value!r}")
+            elif name == "match":
+                try:
+                    re.compile(value)
+                except re.error as e:
+                    raise ScriptError(f"line {line_no}: bad match pattern {value!r}: {e}")
+            options[name] = value
+            line = line[:directive.start()]
+        steps.append(ScriptStep(line.strip(), line_no=line_no, **options))
+    return steps
+
+
+def load_script(path, default_timeout=DEFAULT_COMMAND_TIMEOUT):
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_script(f.read(), default_timeout)
+
+
+def run_steps(transport, steps, stop_on_failure=True):
+    """Run steps back-to-back over one open transport"""
+    results = []
+    for step in steps:
+        try:
+            response = transport.execute(step.command, step.timeout)
+            result = StepResult(step, response, step.check(response))
+        except Exception as e:
+            result = StepResult(step, error=str(e))
+        results.append(result)
+        if stop_on_failure and not result.passed:
+            break
+    return results
+
+
+def print_step_results(results, out=sys.stdout):
+    for result in results:
+        status = "PASS" if result.passed else "FAIL"
+        elapsed = f" {result.response.elapsed:.3f}s" if result.response else ""
+        out.write(f"[{status}]{elapsed} {result.step.command}\n")
+        if result.response:
+            for line in result.response.lines:
+                out.write(f"    {line}\n")
+        if result.error:
+            out.write(f"    Error: {result.error}\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run a script of AT commands over one connection")
+    parser.add_argument("script", help="file with one AT command per line")
+    parser.add_argument("-p", "--port", required=True)
+    parser.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE)
+    parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_COMMAND_TIMEOUT,
+                        help="default per-command timeout in seconds")
+    parser.add_argument("--continue", dest="keep_going", action="store_true",
+                        help="keep running after a failed step")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        steps = load_script(args.script, args.timeout)
+    except (OSError, ScriptError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        with ATTransport(args.port, args.baudrate) as transport:
+            results = run_steps(transport, steps, stop_on_failure=not args.keep_going)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        json.dump([result.to_dict() for result in results], sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print_step_results(results)
+    passed = len(results) == len(steps) and all(result.passed for result in results)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
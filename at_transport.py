@@ -0,0 +1,488 @@
+# at_transport.py
+import queue
+import threading
+import time
+import serial
+from at_metrics import REGISTRY, command_verb
+from line_framer import LineFramer
+from serial_reader import SerialReader
+from traffic_capture import capture_for
+
+DEFAULT_BAUDRATE = 115200
+DEFAULT_TIMEOUT = 1.0
+# Предельное время ожидания финального кода, если модем молчит
+DEFAULT_COMMAND_TIMEOUT = 10.0
+# Сколько ждать финальный код опоздавшего ответа, прежде чем писать следующую команду
+RESYNC_TIMEOUT = 2.0
+
+FINAL_RESULT_CODES = ("OK", "ERROR", "NO CARRIER", "NO DIALTONE", "BUSY", "NO ANSWER", "CONNECT")
+FINAL_RESULT_PREFIXES = ("+CME ERROR:", "+CMS ERROR:", "CONNECT ")
+# Незапрошенные сообщения модема (URC)
+URC_PREFIXES = ("+CREG:", "+CEREG:", "+CGREG:", "+C5GREG:", "+CGEV:", "+CMTI:", "+CMT:", "+CDS:", "+CBM:",
+                "+CUSD:", "+CSQ:", "+CIEV:", "+CTZV:", "+CRING:", "+CLIP:", "RING")
+
+
+def is_final_result(line):
+    """True if the line is a final result code that ends a command response"""
+    return line in FINAL_RESULT_CODES or line.startswith(FINAL_RESULT_PREFIXES)
+
+
+def is_error_result(line):
+    return line == "ERROR" or line.startswith(("+CME ERROR:", "+CMS ERROR:"))
+
+
+def response_prefix(command):
+    """Prefix of the command's own information lines: AT+CEREG? -> +CEREG:"""
+    verb = command_verb(command)
+    return verb[2:] + ":" if verb[2:3] in ("+", "!", "#", "$", "%", "^", "*", "@") else None
+
+
+def is_urc(line, command=None):
+    """True if a line received during the command is an unsolicited result code"""
+    if not line.startswith(URC_PREFIXES):
+        return False
+    # +CEREG: в ответ на AT+CEREG? - часть ответа, а не URC
+    prefix = response_prefix(command) if command else None
+    return not (prefix and line.startswith(prefix))
+
+
+class ATResponse:
+    """Lines of a command response and the final result code that ended it"""
+
+    def __init__(self, command, lines, final, elapsed):
+        self.command = command
+        self.lines = lines
+        self.final = final
+        self.elapsed = elapsed
+
+    @property
+    def timed_out(self):
+        return self.final is None
+
+    @property
+    def ok(self):
+        return self.final is not None and not is_error_result(self.final)
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    def __repr__(self):
+        return f"ATResponse({self.command!r}, final={self.final!r}, elapsed={self.elapsed:.3f})"
+
+
+class URCSubscription:
+    """Unsolicited lines matching the prefixes, queued for get() or passed to a callback on the dispatch thread"""
+
+    def __init__(self, transport, prefixes=(), callback=None):
+        self.transport = transport
+        self.prefixes = tuple(prefixes)
+        self.callback = callback
+        self.queue = queue.SimpleQueue()
+
+    def matches(self, line):
+        return not self.prefixes or line.startswith(self.prefixes)
+
+    def get(self, timeout=None):
+        """Next queued line, None if nothing arrived within the timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.transport.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ATTransport:
+    """Persistent AT command connection to a single serial port"""
+
+    def __init__(self, port, baudrate=DEFAULT_BAUDRATE, timeout=DEFAULT_TIMEOUT, metrics=REGISTRY, capture=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.metrics = metrics
+        # TrafficCapture для сырого трафика порта: None - по MODEMSETUP_CAPTURE_DIR, False - без записи
+        self.capture = capture_for(port) if capture is None else (capture or None)
+        self.serial_conn = None
+        self.framer = LineFramer()
+        self.bytes_in = 0
+        # Одна команда на порт в каждый момент времени
+        self.lock = threading.RLock()
+        # Фоновый читатель: единственный, кто читает порт, делит поток на ответы и URC
+        self.reader = None
+        self.reader_error = None
+        self.on_line = None
+        self.on_error = None
+        self.in_flight = None
+        self.in_flight_consumer = None
+        # Команда, чей ответ не пришёл вовремя: его остаток ещё в пути и не должен стать чужим ответом
+        self.stale_command = None
+        self.response_cond = threading.Condition()
+        self.subscriptions = []
+        self.dispatch_queue = None
+
+    @property
+    def is_open(self):
+        return self.serial_conn is not None and self.serial_conn.is_open
+
+    def open(self):
+        with self.lock:
+            if not self.is_open:
+                self.serial_conn = serial.Serial(
+                    port=self.port,
+                    baudrate=self.baudrate,
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_ONE,
+                    timeout=self.timeout
+                )
+                # Остатки прошлой сессии на порту не должны попасть в ответ первой команды
+                self.reset_input()
+        return self
+
+    def reset_input(self):
+        """Drop received data not read yet and forget a timed-out command's pending reply"""
+        with self.lock:
+            if self.is_open:
+                self.serial_conn.reset_input_buffer()
+            self.framer.reset()
+            self.stale_command = None
+
+    def close(self):
+        with self.lock:
+            self.stop_reader()
+            if self.serial_conn is not None:
+                try:
+                    if self.serial_conn.is_open:
+                        self.serial_conn.close()
+                finally:
+                    self.serial_conn = None
+                    self.framer.reset()
+                    self.stale_command = None
+
+    def set_baudrate(self, baudrate):
+        """Change the local rate of the link, the modem side is switched with AT+IPR"""
+        with self.lock:
+            self.baudrate = baudrate
+            if self.is_open:
+                self.serial_conn.baudrate = baudrate
+                self.framer.reset()
+
+    def write_command(self, command):
+        """Write a command terminated with CR LF without waiting for the reply, returns bytes written"""
+        if not command.endswith('\r\n'):
+            command += '\r\n'
+        data = command.encode('ascii', errors='ignore')
+        with self.lock:
+            self.open()
+            self.serial_conn.write(data)
+        if self.capture is not None:
+            self.capture.tx(data)
+        return len(data)
+
+    def _read_line(self, deadline):
+        """Next non-empty line received before the deadline, or None"""
+        conn = self.serial_conn
+        try:
+            while True:
+                line = self.framer.next_line()
+                if line is not None:
+                    return line
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                # read() ждёт не дольше, чем осталось до срока команды
+                wait = remaining if self.timeout is None else min(self.timeout, remaining)
+                if conn.timeout != wait:
+                    conn.timeout = wait
+                # Всё, что уже пришло, одним вызовом; readline() читал бы по байту
+                data = conn.read(max(1, conn.in_waiting))
+                if data:
+                    self.bytes_in += len(data)
+                    if self.capture is not None:
+                        self.capture.rx(data)
+                    self.framer.feed(data)
+        finally:
+            if conn.timeout != self.timeout:
+                conn.timeout = self.timeout
+
+    def _stale_line(self, line):
+        """True if the line is left over from a timed-out command; its final code ends the resync"""
+        if self.stale_command is None or is_urc(line, self.stale_command):
+            return False
+        if is_final_result(line):
+            self.stale_command = None
+        return True
+
+    def _resync(self):
+        """Read off the rest of a timed-out command's reply before the next command is written"""
+        deadline = time.monotonic() + RESYNC_TIMEOUT
+        if self.reader is not None:
+            # Остаток ответа отбрасывает поток чтения, ждём его финальный код
+            with self.response_cond:
+                while self.stale_command is not None and self.reader_error is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.response_cond.wait(remaining)
+                self.stale_command = None
+            return
+        while self.stale_command is not None:
+            line = self._read_line(deadline)
+            if line is None:
+                break
+            if not self._stale_line(line):
+                self._dispatch_urc(line)
+        self.stale_command = None
+
+    def execute(self, command, timeout=DEFAULT_COMMAND_TIMEOUT, on_line=None):
+        """Send a command and read until a final result code or the timeout, URCs go to subscribers
+
+        Without the background reader a URC no subscriber wants stays in the response, so
+        front-ends that do not subscribe still show +CMTI, RING and the like. With on_line the
+        response lines, final code included, are streamed to it as they arrive instead of
+        being collected in the returned response. After a timeout the late reply is read
+        off and discarded before the next command goes out, so replies never shift by one.
+        """
+        with self.lock:
+            if self.stale_command is not None:
+                self._resync()
+            started = time.monotonic()
+            deadline = started + timeout
+            bytes_in = self.bytes_in
+            response = ATResponse(command, [], None, 0.0)
+            if self.reader is not None:
+                bytes_out = self._execute_via_reader(response, deadline, on_line)
+            else:
+                bytes_out = self.write_command(command)
+                while True:
+                    line = self._read_line(deadline)
+                    if line is None:
+                        break
+                    # URC без подписчика остаётся в ответе, как до разделения потока
+                    if is_urc(line, command) and self._dispatch_urc(line):
+                        continue
+                    if on_line is not None:
+                        on_line(line)
+                    else:
+                        response.lines.append(line)
+                    if is_final_result(line):
+                        response.final = line
+                        break
+                if response.final is None:
+                    self.stale_command = command
+            response.elapsed = time.monotonic() - started
+            if self.metrics is not None:
+                self.metrics.observe(command, response.elapsed, response.timed_out,
+                                     response.final is not None and is_error_result(response.final),
+                                     bytes_out, self.bytes_in - bytes_in)
+            return response
+
+    def _execute_via_reader(self, response, deadline, on_line):
+        # Ответ собирает поток чтения; здесь только ждём финальный код
+        with self.response_cond:
+            self.in_flight = response
+            self.in_flight_consumer = on_line
+        try:
+            bytes_out = self.write_command(response.command)
+            with self.response_cond:
+                while response.final is None and self.reader_error is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.response_cond.wait(remaining)
+        finally:
+            with self.response_cond:
+                self.in_flight = None
+                self.in_flight_consumer = None
+                if response.final is None:
+                    self.stale_command = response.command
+        if response.final is None and self.reader_error is not None:
+            raise self.reader_error
+        return bytes_out
+
+    def start_reader(self, on_line=None, on_error=None):
+        """Hand all reading to a background thread that splits command responses from URCs
+
+        on_line sees every received line, on_error the exception that stopped the reader;
+        both are called from the reader thread.
+        """
+        with self.lock:
+            self.open()
+            if self.reader is None:
+                self.on_line = on_line
+                self.on_error = on_error
+                self.reader_error = None
+                self.framer.reset()
+                self.reader = SerialReader(self.serial_conn, on_data=self._count_rx, on_line=self._route_line,
+                                           on_error=self._reader_failed, capture=self.capture)
+                self.reader.start()
+        return self
+
+    def stop_reader(self):
+        with self.lock:
+            reader, self.reader = self.reader, None
+            if reader is not None:
+                reader.stop()
+
+    def _count_rx(self, data):
+        self.bytes_in += len(data)
+
+    def _route_line(self, line):
+        with self.response_cond:
+            response = self.in_flight
+            consumer = self.in_flight_consumer
+            solicited = response is not None and response.final is None and not is_urc(line, response.command)
+            if solicited and consumer is None:
+                response.lines.append(line)
+            stale = not solicited and self._stale_line(line)
+            if stale and self.stale_command is None:
+                self.response_cond.notify_all()
+        if solicited:
+            # Потребитель вызывается вне блокировки: запись в файл не задерживает других
+            if consumer is not None:
+                consumer(line)
+            if is_final_result(line):
+                with self.response_cond:
+                    response.final = line
+                    self.response_cond.notify_all()
+        if self.on_line:
+            self.on_line(line)
+        if not solicited and not stale:
+            self._dispatch_urc(line)
+
+    def _reader_failed(self, error):
+        with self.response_cond:
+            self.reader_error = error
+            self.response_cond.notify_all()
+        if self.on_error:
+            self.on_error(error)
+
+    def subscribe(self, prefixes=(), callback=None):
+        """Receive unsolicited lines starting with any of the prefixes (all lines if empty)
+
+        Without a callback lines are queued on the returned subscription; a callback runs on
+        the transport's dispatch thread, so a slow subscriber never holds up a command.
+        """
+        subscription = URCSubscription(self, prefixes, callback)
+        with self.response_cond:
+            if callback is not None and self.dispatch_queue is None:
+                self.dispatch_queue = queue.SimpleQueue()
+                threading.Thread(target=self._dispatch_callbacks, daemon=True, name=f"urc-{self.port}").start()
+            # Список заменяется целиком, читатель перебирает снимок без блокировки
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.response_cond:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def _dispatch_urc(self, line):
+        """Hand a URC to matching subscribers, returns True if any took it"""
+        claimed = False
+        for subscription in self.subscriptions:
+            if subscription.matches(line):
+                claimed = True
+                if subscription.callback is None:
+                    subscription.queue.put(line)
+                else:
+                    self.dispatch_queue.put((subscription.callback, line))
+        return claimed
+
+    def _dispatch_callbacks(self):
+        while True:
+            callback, line = self.dispatch_queue.get()
+            try:
+                callback(line)
+            except Exception:
+                # Ошибка одного подписчика не должна останавливать доставку остальным
+                pass
+
+    def wait_for(self, predicate, timeout, subscription=None):
+        """Block until an unsolicited line satisfies predicate, returns the line or None on timeout
+
+        Pass a queue subscription taken before sending the command that triggers the URC
+        so that a line arriving early is not missed.
+        """
+        own = subscription is None
+        if own:
+            subscription = self.subscribe()
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                line = subscription.get(0)
+                while line is not None:
+                    if predicate(line):
+                        return line
+                    line = subscription.get(0)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if self.reader is not None:
+                    line = subscription.get(remaining)
+                    if line is not None and predicate(line):
+                        return line
+                else:
+                    # Без фонового читателя порт читаем сами
+                    with self.lock:
+                        self.open()
+                        line = self._read_line(deadline)
+                        if line is not None and self._stale_line(line):
+                            continue
+                    if line is not None:
+                        self._dispatch_urc(line)
+        finally:
+            if own:
+                subscription.close()
+
+    def send(self, command, timeout=DEFAULT_COMMAND_TIMEOUT):
+        """Send a command and return its response text"""
+        return self.execute(command, timeout).text
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(port, baudrate=DEFAULT_BAUDRATE):
+    """Return the shared transport for a port, creating it on first use"""
+    with _transports_lock:
+        transport = _transports.get(port)
+        if transport is None:
+            transport = ATTransport(port, baudrate)
+            _transports[port] = transport
+        return transport
+
+
+def open_ports():
+    """Names of ports currently held open by shared transports"""
+    with _transports_lock:
+        return [port for port, transport in _transports.items() if transport.is_open]
+
+
+def close_transport(port):
+    with _transports_lock:
+        transport = _transports.pop(port, None)
+    if transport is not None:
+        transport.close()
+
+
+def close_all_transports():
+    with _transports_lock:
+        transports = list(_transports.values())
+        _transports.clear()
+    for transport in transports:
+        transport.close()
@@ -0,0 +1,160 @@
+# autobaud.py
+import argparse
+import re
+import sys
+import time
+from at_transport import ATTransport, DEFAULT_BAUDRATE
+
+STANDARD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600, 3000000)
+# Частые скорости сначала: большинство модемов стоит на 115200
+DETECT_ORDER = (115200, 921600, 460800, 230400, 57600, 38400, 19200, 9600)
+PROBE_TIMEOUT = 0.2
+# Модем переключает скорость после отправки OK, даём ему договорить
+SETTLE_DELAY = 0.05
+VERIFY_COMMANDS = 3
+# Сколько модем должен молчать, чтобы опоздавший ответ пробы точно пришёл и был выброшен
+QUIET_TIME = PROBE_TIMEOUT
+QUIET_LIMIT = 1.0
+
+
+def _drain(transport, quiet=QUIET_TIME, limit=QUIET_LIMIT):
+    """Wait until the port has been silent for quiet seconds, dropping whatever arrives meanwhile"""
+    conn = transport.serial_conn
+    started = silent_since = time.monotonic()
+    while True:
+        now = time.monotonic()
+        if now - silent_since >= quiet or now - started >= limit:
+            break
+        if conn.in_waiting:
+            conn.reset_input_buffer()
+            silent_since = now
+        time.sleep(0.01)
+    transport.reset_input()
+
+
+def _answers(transport, attempts=2, timeout=PROBE_TIMEOUT):
+    for _ in range(attempts):
+        # Первый AT после смены скорости часто съедает мусор в буфере модема
+        ok = transport.execute("AT", timeout).ok
+        # OK, пришедший после срока пробы, не должен стать ответом следующей пробы или команды
+        _drain(transport)
+        if ok:
+            return True
+    return False
+
+
+def find_rate(transport, rates=DETECT_ORDER, preferred=None):
+    """Try rates on an open transport until the modem answers AT, leaves it at that rate or returns None"""
+    order = ([preferred] if preferred else []) + list(rates)
+    for rate in dict.fromkeys(order):
+        transport.set_baudrate(rate)
+        transport.reset_input()
+        if _answers(transport):
+            return rate
+    return None
+
+
+def detect_baudrate(port, rates=DETECT_ORDER, preferred=DEFAULT_BAUDRATE):
+    """Rate the modem on the port currently answers at, or None"""
+    with ATTransport(port, preferred, timeout=0.05, metrics=None) as transport:
+        return find_rate(transport, rates, preferred)
+
+
+def supported_rates(transport):
+    """Rates listed by AT+IPR=?, None if the modem does not say"""
+    response = transport.execute("AT+IPR=?", 2.0)
+    if not response.ok:
+        return None
+    for line in response.lines:
+        match = re.match(r"^\+IPR:\s*\(([^)]*)\)", line)
+        if not match:
+            continue
+        rates = set()
+        for item in match.group(1).split(","):
+            bounds = [int(value) for value in re.findall(r"\d+", item)]
+            if len(bounds) == 2 and "-" in item:
+                rates.update(rate for rate in STANDARD_RATES if bounds[0] <= rate <= bounds[1])
+            elif bounds:
+                rates.add(bounds[0])
+        return rates
+    return None
+
+
+def link_ok(transport, commands=VERIFY_COMMANDS):
+    """Several short commands and one multi-line reply pass cleanly at the current rate"""
+    if not all(transport.execute("AT", PROBE_TIMEOUT * 2).ok for _ in range(commands)):
+        return False
+    response = transport.execute("ATI", 2.0)
+    return response.ok and len(response.lines) > 1
+
+
+def switch_baudrate(transport, rate):
+    """Move the modem and the port to the rate; on failure put both back and return False"""
+    previous = transport.baudrate
+    if not transport.execute(f"AT+IPR={rate}", 2.0).ok:
+        return False
+    time.sleep(SETTLE_DELAY)
+    transport.set_baudrate(rate)
+    transport.reset_input()
+    if link_ok(transport):
+        return True
+
+    # Линия не держит скорость: ищем модем и возвращаем его на прежнюю
+    found = find_rate(transport, (rate, previous) + DETECT_ORDER)
+    if found is not None and found != previous:
+        transport.execute(f"AT+IPR={previous}", 2.0)
+        time.sleep(SETTLE_DELAY)
+    transport.set_baudrate(previous)
+    transport.reset_input()
+    if not _answers(transport):
+        raise ConnectionError(f"{transport.port}: modem lost after trying {rate} baud")
+    return False
+
+
+def negotiate_baudrate(transport, max_rate=921600):
+    """Raise the link to the fastest rate up to max_rate that passes verification, returns the rate in use"""
+    transport.open()
+    current = transport.baudrate
+    supported = supported_rates(transport)
+    for rate in sorted(STANDARD_RATES, reverse=True):
+        if rate <= current or rate > max_rate:
+            continue
+        if supported is not None and rate not in supported:
+            continue
+        if switch_baudrate(transport, rate):
+            return rate
+    return current
+
+
+def restore_baudrate(transport, rate):
+    """Put the modem back on a rate, e.g. the one the GUIs expect, after a bulk transfer"""
+    if transport.baudrate != rate and transport.is_open:
+        if transport.execute(f"AT+IPR={rate}", 2.0).ok:
+            time.sleep(SETTLE_DELAY)
+        transport.set_baudrate(rate)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Detect a modem's baud rate and optionally raise it with AT+IPR")
+    parser.add_argument("-p", "--port", required=True)
+    parser.add_argument("--negotiate", type=int, metavar="MAX_RATE",
+                        help="switch to the fastest rate up to MAX_RATE and leave the modem there")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    rate = detect_baudrate(args.port)
+    if rate is None:
+        print(f"{args.port}: no AT response at any rate", file=sys.stderr)
+        return 1
+    print(f"{args.port}: {rate} baud")
+    if args.negotiate:
+        with ATTransport(args.port, rate) as transport:
+            new_rate = negotiate_baudrate(transport, args.negotiate)
+        print(f"{args.port}: now {new_rate} baud")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
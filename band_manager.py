@@ -0,0 +1,172 @@
+# band_manager.py
+import re
+import threading
+import time
+from at_parsers import BandParser
+from at_transport import get_transport
+
+BAND_SET_RE = re.compile(r"^AT!BAND=([0-9A-F]{1,2})$", re.I)
+# +CEREG: <stat> (URC) или +CEREG: <n>,<stat> (ответ на запрос); 1 - дома, 5 - роуминг
+REG_RE = re.compile(r"^\+C(?:E|G)?REG:\s*(?:\d,)?(\d)")
+REGISTERED = ("1", "5")
+# Ответ на AT+CEREG?: +CEREG: <n>,<stat>; n=0 - URC о регистрации выключены
+CEREG_MODE_RE = re.compile(r"^\+CEREG:\s*(\d),")
+REGISTRATION_PREFIXES = ("+CEREG:", "+CREG:", "+CGREG:")
+REGISTRATION_TIMEOUT = 60.0
+# Модем, теряющий регистрацию при смене диапазона, сообщает об этом за это время
+REGISTRATION_GRACE = 2.0
+
+
+class BandError(Exception):
+    pass
+
+
+def band_target(command):
+    """Band index of an AT!BAND=xx command, None for any other command"""
+    match = BAND_SET_RE.match(command.strip())
+    return int(match.group(1), 16) if match else None
+
+
+def registration_state(line):
+    match = REG_RE.match(line)
+    return match.group(1) if match else None
+
+
+class BandResult:
+    def __init__(self, port, before, after, changed, registered=None, elapsed=0.0):
+        self.port = port
+        self.before = before
+        self.after = after
+        self.changed = changed
+        self.registered = registered
+        self.elapsed = elapsed
+
+    def describe(self):
+        if not self.changed:
+            return f"Band already {self.after:02X}, nothing to write"
+        text = f"Band changed {self.before:02X} -> {self.after:02X}"
+        if self.registered is True:
+            text += f", registered in {self.elapsed:.1f}s"
+        elif self.registered is False:
+            text += f", not registered after {self.elapsed:.1f}s"
+        return text
+
+
+class BandManager:
+    """Writes AT!BAND only when the modem's current band profile differs from the target"""
+
+    def __init__(self, transport, unlock_password=None, registration_timeout=REGISTRATION_TIMEOUT):
+        self.transport = transport
+        # Некоторые прошивки Sierra принимают AT!BAND= только после AT!ENTERCND
+        self.unlock_password = unlock_password
+        self.registration_timeout = registration_timeout
+        self.band = None
+        self.lock = threading.Lock()
+
+    def invalidate(self):
+        self.band = None
+
+    def query_band(self):
+        response = self.transport.execute("AT!BAND?")
+        current = BandParser().feed_lines(response.lines)
+        if not response.ok or not current:
+            raise BandError(f"AT!BAND? failed: {response.final or 'timeout'}")
+        self.band = current[0].index
+        return self.band
+
+    def current_band(self, refresh=False):
+        with self.lock:
+            if self.band is None or refresh:
+                self.query_band()
+            return self.band
+
+    def registration_mode(self):
+        """The <n> setting of AT+CEREG ("0" - no registration URCs), None if the modem does not say"""
+        response = self.transport.execute("AT+CEREG?")
+        for line in response.lines:
+            match = CEREG_MODE_RE.match(line)
+            if match:
+                return match.group(1)
+        return None
+
+    def apply(self, target, wait_registration=True, current=None):
+        """Switch to the target band index if needed, verify it and wait for re-registration
+
+        The band is read with AT!BAND? on every call, so a change made by another tool, a
+        reset or a raw AT!BAND= is never missed; pass current only for a value just read.
+        To wait for re-registration, registration URCs are enabled with AT+CEREG=1 for the
+        duration of the call and the previous setting is restored afterwards.
+        """
+        if isinstance(target, str):
+            target = int(target, 16)
+        with self.lock:
+            started = time.monotonic()
+            before = current if current is not None else self.query_band()
+            if before == target:
+                return BandResult(self.transport.port, before, target, False)
+
+            # Подписка до записи: URC о регистрации может прийти раньше, чем проверка диапазона
+            with self.transport.subscribe(REGISTRATION_PREFIXES) as registration:
+                mode = None
+                if wait_registration:
+                    # URC о регистрации нужны, чтобы ждать событие, а не фиксированную паузу
+                    mode = self.registration_mode()
+                    if mode in (None, "0"):
+                        self.transport.execute("AT+CEREG=1")
+                try:
+                    if self.unlock_password:
+                        self.transport.execute(f'AT!ENTERCND="{self.unlock_password}"')
+                    response = self.transport.execute(f"AT!BAND={target:02X}")
+                    if not response.ok:
+                        self.band = None
+                        raise BandError(f"AT!BAND={target:02X} failed: {response.final or 'timeout'}")
+
+                    if self.query_band() != target:
+                        raise BandError(f"band is {self.band:02X} after writing {target:02X}")
+
+                    registered = None
+                    if wait_registration:
+                        registered = self.wait_registered(registration, self.registration_timeout)
+                finally:
+                    # Неизвестный прежний режим вернуть нельзя - тогда остаётся AT+CEREG=1
+                    if mode == "0":
+                        self.transport.execute("AT+CEREG=0")
+            return BandResult(self.transport.port, before, target, True, registered,
+                              time.monotonic() - started)
+
+    def wait_registered(self, subscription, timeout):
+        """Wait for re-registration after a band write
+
+        A modem that drops off the network reports it with a +CEREG URC within the grace period
+        and is then waited for by URC. One that keeps its registration sends nothing, so after
+        the grace period a single AT+CEREG? answers instead of waiting out the whole timeout.
+        """
+        deadline = time.monotonic() + timeout
+        line = self.transport.wait_for(lambda line: registration_state(line) is not None,
+                                       min(timeout, REGISTRATION_GRACE), subscription)
+        if line is None:
+            # Регистрация не терялась: URC не будет, спрашиваем сразу
+            if self.query_registered():
+                return True
+        elif registration_state(line) in REGISTERED:
+            return True
+        line = self.transport.wait_for(lambda line: registration_state(line) in REGISTERED,
+                                       max(0.0, deadline - time.monotonic()), subscription)
+        return line is not None or self.query_registered()
+
+    def query_registered(self):
+        response = self.transport.execute("AT+CEREG?")
+        return any(registration_state(line) in REGISTERED for line in response.lines)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_band_manager(port):
+    """Band manager bound to the shared transport of a port"""
+    with _managers_lock:
+        manager = _managers.get(port)
+        if manager is None or manager.transport is not get_transport(port):
+            manager = _managers[port] = BandManager(get_transport(port))
+        return manager
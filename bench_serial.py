@@ -0,0 +1,256 @@
+# bench_serial.py
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+from at_transport import ATTransport, is_final_result
+from command_scheduler import CommandScheduler, TELEMETRY
+from fake_modem import FakeModem
+from serial_reader import SerialReader
+
+# Фоновая нагрузка для замера приоритетов: опросы с ответом в несколько сотен строк
+BACKGROUND_POLLERS = 4
+BACKGROUND_COMMAND = "AT!DUMP=200"
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(name, rtts, total_time, nbytes=0):
+    rtts = sorted(rtts)
+    return {
+        "name": name,
+        "commands": len(rtts),
+        "p50_ms": round(percentile(rtts, 0.50) * 1000, 3) if rtts else None,
+        "p95_ms": round(percentile(rtts, 0.95) * 1000, 3) if rtts else None,
+        "p99_ms": round(percentile(rtts, 0.99) * 1000, 3) if rtts else None,
+        "commands_per_s": round(len(rtts) / total_time, 1) if total_time else None,
+        "bytes_per_s": round(nbytes / total_time) if nbytes and total_time else None,
+    }
+
+
+def bench_transport(port, command, iterations):
+    """Persistent ATTransport.execute(), used by ModemSetup, sendCommand and sendCommand2"""
+    rtts = []
+    with ATTransport(port) as transport:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            transport.execute(command)
+            rtts.append(time.perf_counter() - t0)
+        return rtts, time.perf_counter() - started
+
+
+def bench_demux(port, command, iterations):
+    """ATTransport.execute() with the background reader splitting responses from URCs"""
+    rtts = []
+    with ATTransport(port) as transport:
+        transport.start_reader()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            transport.execute(command)
+            rtts.append(time.perf_counter() - t0)
+        return rtts, time.perf_counter() - started
+
+
+def _under_load(port, command, iterations, scheduled):
+    rtts = []
+    stop = threading.Event()
+    with ATTransport(port) as transport:
+        transport.start_reader()
+        scheduler = CommandScheduler(transport).start() if scheduled else None
+
+        def poller():
+            while not stop.is_set():
+                if scheduler is None:
+                    transport.execute(BACKGROUND_COMMAND)
+                else:
+                    scheduler.execute(BACKGROUND_COMMAND, priority=TELEMETRY)
+
+        threads = [threading.Thread(target=poller, daemon=True) for _ in range(BACKGROUND_POLLERS)]
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(0.05)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                if scheduler is None:
+                    transport.execute(command)
+                else:
+                    scheduler.execute(command)
+                rtts.append(time.perf_counter() - t0)
+                # Интерактивные команды редкие: между ними фон снова занимает порт
+                time.sleep(0.002)
+            return rtts, time.perf_counter() - started
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(10)
+            if scheduler is not None:
+                scheduler.close()
+
+
+def bench_contended(port, command, iterations):
+    """Interactive commands racing background polls for the transport lock"""
+    return _under_load(port, command, iterations, scheduled=False)
+
+
+def bench_scheduled(port, command, iterations):
+    """Interactive commands ahead of telemetry-priority polls in a CommandScheduler"""
+    return _under_load(port, command, iterations, scheduled=True)
+
+
+def bench_reopen(port, command, iterations):
+    """Port opened and closed around every command, as the front-ends did before"""
+    rtts = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        with ATTransport(port) as transport:
+            transport.execute(command)
+        rtts.append(time.perf_counter() - t0)
+    return rtts, time.perf_counter() - started
+
+
+def bench_legacy(port, command, iterations, timeout=1.0):
+    """Open per command and read until readline() times out, the original SerialThread loop"""
+    rtts = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        with ATTransport(port, timeout=timeout) as transport:
+            transport.write_command(command)
+            while transport.serial_conn.readline():
+                pass
+        rtts.append(time.perf_counter() - t0)
+    return rtts, time.perf_counter() - started
+
+
+def bench_reader(port, command, iterations):
+    """Write + background SerialReader, the ModemSetup2 and sendCommandTest path"""
+    rtts = []
+    finished = threading.Event()
+
+    def on_line(line):
+        if is_final_result(line):
+            finished.set()
+
+    with ATTransport(port) as transport:
+        reader = SerialReader(transport.serial_conn, on_line=on_line)
+        reader.start()
+        try:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                finished.clear()
+                t0 = time.perf_counter()
+                transport.write_command(command)
+                finished.wait(10)
+                rtts.append(time.perf_counter() - t0)
+            return rtts, time.perf_counter() - started
+        finally:
+            reader.stop()
+
+
+def bench_throughput(port, lines, iterations):
+    """Large AT!DUMP replies through ATTransport.execute()"""
+    rtts = []
+    nbytes = 0
+    with ATTransport(port) as transport:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            response = transport.execute(f"AT!DUMP={lines}")
+            rtts.append(time.perf_counter() - t0)
+            nbytes += sum(len(line) + 2 for line in response.lines)
+        return rtts, time.perf_counter() - started, nbytes
+
+
+def read_version():
+    try:
+        with open("version.txt", 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def run(args):
+    results = []
+    with FakeModem(latency=args.latency, jitter=args.jitter, urc_interval=args.urc_interval, seed=1) as modem:
+        for name, bench in (("transport", bench_transport), ("demux", bench_demux), ("reader", bench_reader),
+                            ("reopen", bench_reopen), ("contended", bench_contended),
+                            ("scheduled", bench_scheduled)):
+            rtts, total = bench(modem.port, args.command, args.iterations)
+            results.append(summarize(name, rtts, total))
+        if args.legacy_iterations:
+            rtts, total = bench_legacy(modem.port, args.command, args.legacy_iterations)
+            results.append(summarize("legacy", rtts, total))
+        rtts, total, nbytes = bench_throughput(modem.port, args.dump_lines, args.throughput_iterations)
+        results.append(summarize(f"throughput_{args.dump_lines}_lines", rtts, total, nbytes))
+    return {
+        "version": read_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {
+            "command": args.command,
+            "iterations": args.iterations,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "urc_interval": args.urc_interval,
+            "dump_lines": args.dump_lines,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, out=sys.stdout):
+    old = {result["name"]: result for result in baseline["results"]}
+    for result in report["results"]:
+        before = old.get(result["name"])
+        if not before or not before.get("p50_ms") or not result.get("p50_ms"):
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"]
+        out.write(f"{result['name']:<24} p50 {before['p50_ms']:>9.3f} -> {result['p50_ms']:>9.3f} ms  x{ratio:.2f}\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Round-trip and throughput benchmark against a simulated modem")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("-c", "--command", default="ATI")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated modem latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--urc-interval", type=float, default=None)
+    parser.add_argument("--legacy-iterations", type=int, default=0,
+                        help="also time the old readline-until-timeout loop (about 1 s per command)")
+    parser.add_argument("--dump-lines", type=int, default=5000, help="lines in the throughput reply")
+    parser.add_argument("--throughput-iterations", type=int, default=5)
+    parser.add_argument("-o", "--output", help="write the JSON report to a file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(report, json.load(f), sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,9 @@
 # build.py
 import subprocess
 import os
+import sys
 from generate_verfile import generate_ver_file
+from modemsetup_cli import TOOLS
 
 def build():
     # Генерируем version_info.txt файл
@@ -21,5 +23,24 @@ def build():
         "ModemSetup.py"
     ])
 
+def build_cli():
+    # Консольная утилита без GUI: PyQt5 и tkinter в сборку не попадают, распаковка и запуск быстрые.
+    # Подкоманды импортируются по имени строкой, PyInstaller сам их не найдёт
+    hidden_imports = [f"--hidden-import={module}" for module, _ in TOOLS.values()]
+    subprocess.run([
+        "pyinstaller",
+        "--onefile",
+        "--console",
+        "--strip",
+        "--name=modemsetup-cli",
+        "--exclude-module=PyQt5",
+        "--exclude-module=tkinter",
+        *hidden_imports,
+        "modemsetup_cli.py"
+    ])
+
 if __name__ == "__main__":
-    build()
\ No newline at end of file
+    if "cli" in sys.argv[1:]:
+        build_cli()
+    else:
+        build()
\ No newline at end of file
@@ -0,0 +1,231 @@
+# command_scheduler.py
+import heapq
+import itertools
+import threading
+import time
+from at_transport import DEFAULT_COMMAND_TIMEOUT
+
+# Классы приоритета: меньше - важнее
+INTERACTIVE = 0
+PROVISIONING = 1
+TELEMETRY = 2
+PRIORITIES = {"interactive": INTERACTIVE, "provisioning": PROVISIONING, "telemetry": TELEMETRY}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+
+class CommandCancelled(Exception):
+    """The command was dropped before it reached the modem"""
+
+
+def priority_value(priority):
+    """Priority class from its name or number"""
+    if isinstance(priority, str):
+        try:
+            return PRIORITIES[priority]
+        except KeyError:
+            raise ValueError(f"unknown priority {priority!r}") from None
+    if priority not in PRIORITY_NAMES:
+        raise ValueError(f"unknown priority {priority!r}")
+    return priority
+
+
+class CommandTicket:
+    """A queued command: wait for it with result(), drop it with cancel() while it has not started"""
+
+    def __init__(self, scheduler, command, priority, timeout, on_line, deadline, key, on_done):
+        self.scheduler = scheduler
+        self.command = command
+        self.priority = priority
+        self.timeout = timeout
+        self.on_line = on_line
+        self.key = key
+        self.on_done = on_done
+        self.submitted = time.monotonic()
+        # Не начатая к этому моменту команда устарела и выбрасывается
+        self.deadline = self.submitted + deadline if deadline is not None else None
+        self.started = None
+        self.response = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return isinstance(self.error, CommandCancelled)
+
+    @property
+    def waited(self):
+        """Seconds the command spent in the queue"""
+        return (self.started or time.monotonic()) - self.submitted
+
+    def cancel(self, reason="cancelled"):
+        """Drop the command if it has not started yet, returns True if it was dropped"""
+        return self.scheduler.cancel(self, reason)
+
+    def result(self, timeout=None):
+        """The command's ATResponse; raises CommandCancelled, TimeoutError or the transport's error"""
+        end = None if timeout is None else time.monotonic() + timeout
+        deadline = self.deadline
+        while not self.done.is_set():
+            limits = [limit for limit in (end, deadline) if limit is not None]
+            wait = max(0.0, min(limits) - time.monotonic()) if limits else None
+            if self.done.wait(wait):
+                break
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                # Устаревший опрос снимаем сами, не дожидаясь, пока до него дойдёт очередь
+                if self.cancel("stale"):
+                    break
+                deadline = None
+            if end is not None and now >= end:
+                raise TimeoutError(f"{self.command}: no result within {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def _finish(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+
+
+class CommandScheduler:
+    """Runs one port's commands in priority order on a single worker thread
+
+    Interactive commands go before provisioning, provisioning before telemetry, FIFO within
+    a class. A command on the wire is never interrupted, so an interactive command waits at
+    most for the one already running. Low-priority polls can carry a deadline (dropped if not
+    started in time) and a key (a newer poll with the same key replaces the queued one).
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.port = transport.port
+        self.queue = []
+        self.keys = {}
+        self.sequence = itertools.count()
+        self.cond = threading.Condition()
+        self.current = None
+        self.closed = False
+        self.executed = 0
+        self.cancelled = 0
+        self.max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"scheduler-{self.port}")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, command, priority=INTERACTIVE, timeout=DEFAULT_COMMAND_TIMEOUT, on_line=None,
+               deadline=None, key=None, on_done=None):
+        """Queue a command and return its ticket
+
+        deadline is the number of seconds the command may wait before it is dropped as stale.
+        on_done(ticket) runs on the thread that finishes or cancels the ticket and must not block.
+        """
+        ticket = CommandTicket(self, command, priority_value(priority), timeout, on_line, deadline, key, on_done)
+        with self.cond:
+            if self.closed:
+                raise CommandCancelled(f"{command}: scheduler for {self.port} is closed")
+            if key is not None:
+                previous = self.keys.get(key)
+                if previous is not None:
+                    self._cancel_locked(previous, "superseded")
+                self.keys[key] = ticket
+            heapq.heappush(self.queue, (ticket.priority, next(self.sequence), ticket))
+            self.cond.notify()
+        return ticket
+
+    def execute(self, command, timeout=DEFAULT_COMMAND_TIMEOUT, on_line=None, priority=INTERACTIVE,
+                deadline=None, key=None):
+        """Submit a command and wait for its response, the same call shape as ATTransport.execute()"""
+        return self.submit(command, priority, timeout, on_line, deadline, key).result()
+
+    def cancel(self, ticket, reason="cancelled"):
+        with self.cond:
+            return self._cancel_locked(ticket, reason)
+
+    def _cancel_locked(self, ticket, reason):
+        if ticket.started is not None or ticket.done.is_set():
+            return False
+        if self.keys.get(ticket.key) is ticket:
+            del self.keys[ticket.key]
+        self.cancelled += 1
+        # Запись остаётся в куче и пропускается при извлечении
+        ticket._finish(error=CommandCancelled(f"{ticket.command}: {reason}"))
+        return True
+
+    def cancel_pending(self, priority=None, reason="cancelled"):
+        """Drop queued commands of one class (all classes if None), returns how many were dropped"""
+        with self.cond:
+            return sum(self._cancel_locked(ticket, reason) for _, _, ticket in list(self.queue)
+                       if priority is None or ticket.priority == priority)
+
+    def _next_locked(self):
+        now = time.monotonic()
+        while self.queue:
+            _, _, ticket = heapq.heappop(self.queue)
+            if ticket.done.is_set():
+                continue
+            if ticket.deadline is not None and now >= ticket.deadline:
+                self._cancel_locked(ticket, "stale")
+                continue
+            return ticket
+        return None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                ticket = self._next_locked()
+                while ticket is None and not self.closed:
+                    self.cond.wait()
+                    ticket = self._next_locked()
+                if ticket is None:
+                    return
+                ticket.started = time.monotonic()
+                if self.keys.get(ticket.key) is ticket:
+                    del self.keys[ticket.key]
+                self.current = ticket
+                self.max_wait[ticket.priority] = max(self.max_wait[ticket.priority], ticket.waited)
+            response = error = None
+            try:
+                response = self.transport.execute(ticket.command, ticket.timeout, on_line=ticket.on_line)
+            except Exception as e:
+                error = e
+            with self.cond:
+                self.current = None
+                self.executed += 1
+            ticket._finish(response, error)
+
+    def pending(self):
+        """Number of queued commands per priority name"""
+        with self.cond:
+            counts = {name: 0 for name in PRIORITIES}
+            for _, _, ticket in self.queue:
+                if not ticket.done.is_set():
+                    counts[PRIORITY_NAMES[ticket.priority]] += 1
+            return counts
+
+    def stats(self):
+        with self.cond:
+            current = self.current.command if self.current is not None else None
+        return {
+            "executed": self.executed,
+            "cancelled": self.cancelled,
+            "current": current,
+            "queued": self.pending(),
+            "max_wait_ms": {PRIORITY_NAMES[priority]: round(wait * 1000, 1)
+                            for priority, wait in self.max_wait.items()},
+        }
+
+    def close(self, timeout=DEFAULT_COMMAND_TIMEOUT):
+        """Drop everything still queued and stop the worker after the running command"""
+        with self.cond:
+            self.closed = True
+            for _, _, ticket in self.queue:
+                self._cancel_locked(ticket, "scheduler closed")
+            self.queue.clear()
+            self.cond.notify_all()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
@@ -0,0 +1,274 @@
+# fake_modem.py
+import argparse
+import os
+import random
+import select
+import sys
+import threading
+import time
+
+BAND_TABLE = (
+    (0x00, "All bands", "0002000007C00000", "00000100030818DF"),
+    (0x01, "Europe 3G", "0002000000400000", "0000000000000000"),
+    (0x02, "North America 3G", "0000000004800000", "0000000000000000"),
+    (0x09, "LTE Only", "0000000000000000", "00000100030818DF"),
+)
+BAND_HEADER = "Index, Name,                        GW Band Mask     L Band Mask      TDS Band Mask"
+URC_POOL = ("+CEREG: 1", "+CREG: 1", "+CGREG: 1", "+CSQ: 21,99", "+CMTI: \"SM\",1")
+
+
+class FakeModem:
+    """Sierra-style modem emulated on a pseudo-terminal pair, POSIX only"""
+
+    def __init__(self, latency=0.0, jitter=0.0, urc_interval=None, padding_lines=0,
+                 reattach_delay=0.5, echo=False, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.urc_interval = urc_interval
+        # Лишние информационные строки в каждом ответе - имитация "болтливой" прошивки
+        self.padding_lines = padding_lines
+        self.reattach_delay = reattach_delay
+        self.echo = echo
+        self.random = random.Random(seed)
+        self.band = 0x00
+        # На псевдотерминале скорость ни на что не влияет, только запоминается
+        self.baudrate = 115200
+        self.registered = True
+        # <n> из AT+CEREG=<n>, запоминается для AT+CEREG?
+        self.cereg_mode = 0
+        self.commands = 0
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.write_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        import pty
+        import tty
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.wake_r, self.wake_w = os.pipe()
+        self.threads = [threading.Thread(target=self._serve, daemon=True, name="fake-modem")]
+        if self.urc_interval:
+            self.threads.append(threading.Thread(target=self._urc_noise, daemon=True, name="fake-modem-urc"))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        os.write(self.wake_w, b"x")
+        for thread in self.threads:
+            thread.join(1.0)
+        for fd in (self.master_fd, self.slave_fd, self.wake_r, self.wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _write(self, text):
+        with self.write_lock:
+            data = text.encode()
+            while data and not self.stop_event.is_set():
+                try:
+                    written = os.write(self.master_fd, data)
+                except OSError:
+                    # Порт закрыт, пока ждал отложенный URC
+                    return
+                data = data[written:]
+
+    def _serve(self):
+        buffer = b""
+        while not self.stop_event.is_set():
+            ready, _, _ = select.select([self.master_fd, self.wake_r], [], [])
+            if self.wake_r in ready:
+                break
+            try:
+                chunk = os.read(self.master_fd, 4096)
+            except OSError:
+                break
+            buffer += chunk
+            while b"\r" in buffer:
+                raw, buffer = buffer.split(b"\r", 1)
+                command = raw.strip(b"\n \t").decode('ascii', errors='ignore')
+                if command:
+                    self._answer(command)
+
+    def _answer(self, command):
+        self.commands += 1
+        delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        lines, final = self.handle(command)
+        if self.padding_lines:
+            lines = lines + [f"INFO {i:04d} " + "." * 48 for i in range(self.padding_lines)]
+        body = "".join(f"\r\n{line}" for line in lines)
+        echo = command + "\r" if self.echo else ""
+        self._write(f"{echo}{body}\r\n\r\n{final}\r\n" if lines else f"{echo}\r\n{final}\r\n")
+
+    def handle(self, command):
+        """Return (info lines, final result code) for a command"""
+        upper = command.upper()
+        if upper == "AT":
+            return [], "OK"
+        if upper in ("ATE0", "ATE1"):
+            self.echo = upper == "ATE1"
+            return [], "OK"
+        if upper == "ATI":
+            return ["Manufacturer: Sierra Wireless, Incorporated", "Model: MC7455",
+                    "Revision: SWI9X30C_02.33.03.00", "IMEI: 359072060000000", "+GCAP: +CGSM"], "OK"
+        if upper == "AT!BAND?":
+            return [BAND_HEADER] + [self._band_row(row) for row in BAND_TABLE if row[0] == self.band], "OK"
+        if upper == "AT!BAND=?":
+            return [BAND_HEADER] + [self._band_row(row) for row in BAND_TABLE], "OK"
+        if upper.startswith("AT!BAND="):
+            return self._set_band(upper[len("AT!BAND="):])
+        if upper == "AT!LTEINFO" or upper == "AT!LTEINFO?":
+            return self._lteinfo(), "OK"
+        if upper == "AT!GSTATUS?":
+            return self._gstatus(), "OK"
+        if upper in ("AT+CEREG?", "AT+CREG?"):
+            return [f"{upper[2:-1]}: {self.cereg_mode},{1 if self.registered else 2}"], "OK"
+        if upper.startswith("AT+CEREG=") or upper.startswith("AT+CREG="):
+            value = upper.split("=", 1)[1]
+            if not value.isdigit():
+                return [], "ERROR"
+            if upper.startswith("AT+CEREG="):
+                self.cereg_mode = int(value)
+            return [], "OK"
+        if upper == "AT+IPR=?":
+            return ["+IPR: (0,9600,19200,38400,57600,115200,230400,460800,921600),()"], "OK"
+        if upper == "AT+IPR?":
+            return [f"+IPR: {self.baudrate}"], "OK"
+        if upper.startswith("AT+IPR="):
+            try:
+                self.baudrate = int(upper[len("AT+IPR="):])
+            except ValueError:
+                return [], "ERROR"
+            return [], "OK"
+        if upper.startswith("AT!DUMP="):
+            # Большой ответ для замеров пропускной способности
+            try:
+                count = int(upper[len("AT!DUMP="):])
+            except ValueError:
+                return [], "ERROR"
+            return [f"{i:06d} " + "x" * 57 for i in range(count)], "OK"
+        return [], "ERROR"
+
+    def _band_row(self, row):
+        index, name, gw_mask, lte_mask = row
+        return f"{index:02X}, {name:<29} {gw_mask} {lte_mask} 0000000000000000"
+
+    def _set_band(self, value):
+        try:
+            index = int(value, 16)
+        except ValueError:
+            return [], "ERROR"
+        if index not in [row[0] for row in BAND_TABLE]:
+            return [], "+CME ERROR: 3"
+        if index != self.band:
+            self.band = index
+            self._reattach()
+        return [], "OK"
+
+    def _reattach(self):
+        # Смена диапазонов приводит к перерегистрации в сети
+        self.registered = False
+        self._urc_later(0.01, "+CEREG: 2")
+
+        def attached():
+            self.registered = True
+            self._write("\r\n+CEREG: 1\r\n")
+        timer = threading.Timer(self.reattach_delay, attached)
+        timer.daemon = True
+        timer.start()
+
+    def _urc_later(self, delay, line):
+        timer = threading.Timer(delay, lambda: self._write(f"\r\n{line}\r\n"))
+        timer.daemon = True
+        timer.start()
+
+    def _urc_noise(self):
+        while not self.stop_event.wait(self.urc_interval):
+            self._write(f"\r\n{self.random.choice(URC_POOL)}\r\n")
+
+    def _rsrp(self):
+        return -93 + self.random.randint(-3, 3)
+
+    def _lteinfo(self):
+        rsrp = self._rsrp()
+        return [
+            "!LTEINFO: ",
+            "Serving:   EARFCN MCC MNC   TAC      CID Bd D U SNR PCI  RSRQ   RSRP   RSSI RXLV",
+            f"           1300   250  02 11020 0105A40A  3 5 5   7 388 -10.6  {rsrp}.5  -62.5 --",
+            "",
+            "IntraFreq:                          PCI  RSRQ   RSRP   RSSI RXLV",
+            f"                                    388 -10.6  {rsrp}.5  -62.5 --",
+            "                                    101 -15.0 -101.2  -70.1 --",
+            "",
+            "InterFreq: EARFCN ThresholdLow ThresholdHi Priority PCI  RSRQ   RSRP   RSSI RXLV",
+            "           3050   0            0           0        55  -12.0  -99.0  -68.0 --",
+            "",
+            "WCDMA:     UARFCN ThreshL ThreshH Prio PSC   RSCP  ECN0 RSSI SRXLV",
+        ]
+
+    def _gstatus(self):
+        rsrp = self._rsrp()
+        emm = "Registered     \tNormal Service" if self.registered else "Deregistered   \tNo Service"
+        return [
+            "!GSTATUS: ",
+            f"Current Time:  {int(time.monotonic())}\t\tTemperature: 35",
+            "Reset Counter: 1\t\tMode:        ONLINE         ",
+            "System mode:   LTE        \tPS state:    Attached     ",
+            "LTE band:      B3     \t\tLTE bw:      20 MHz  ",
+            "LTE Rx chan:   1300\t\tLTE Tx chan: 19300",
+            "LTE CA state:  NOT ASSIGNED",
+            f"EMM state:     {emm} ",
+            "RRC state:     RRC Idle       ",
+            "IMS reg state: No Srv  \t\t",
+            "",
+            f"PCC RxM RSSI:  -62\t\tRSRP (dBm):  {rsrp}",
+            f"PCC RxD RSSI:  -65\t\tRSRP (dBm):  {rsrp - 4}",
+            "Tx Power:      --\t\tTAC:         2B0C (11020)",
+            "RSRQ (dB):     -10.6\t\tCell ID:     0105A40A (17146890)",
+            "SINR (dB):      7.0",
+        ]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Emulate a Sierra-style modem on a pseudo-terminal")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds added to latency")
+    parser.add_argument("--urc-interval", type=float, default=None, help="seconds between random URCs")
+    parser.add_argument("--padding-lines", type=int, default=0, help="extra lines in every reply")
+    parser.add_argument("--reattach-delay", type=float, default=0.5, help="seconds to re-register after a band change")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    modem = FakeModem(latency=args.latency, jitter=args.jitter, urc_interval=args.urc_interval,
+                      padding_lines=args.padding_lines, reattach_delay=args.reattach_delay, seed=args.seed)
+    with modem:
+        print(modem.port, flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    print(f"Commands served: {modem.commands}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
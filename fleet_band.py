@@ -0,0 +1,280 @@
+# fleet_band.py
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import serial.tools.list_ports
+from at_orchestrator import baudrate_arg, read_ports_file
+from at_transport import ATTransport, DEFAULT_BAUDRATE
+from autobaud import detect_baudrate
+from band_manager import BandManager, REGISTRATION_TIMEOUT, band_target
+from port_roles import ROLE_BUSY, ROLE_UNKNOWN, RoleCache, detect_roles, device_key
+
+# pyserial блокирующий, поток на модем; сотни потоков дешевле, чем ждать модемы по очереди
+MAX_WORKERS = 256
+PORT_RE = re.compile(r"^(COM\d+|/dev/.+)$", re.I)
+
+
+def parse_profile(value):
+    """Band index from '09', '0x09' or 'AT!BAND=09'"""
+    target = band_target(value)
+    if target is None:
+        try:
+            target = int(value, 16)
+        except ValueError:
+            raise ValueError(f"not a band profile: {value!r}") from None
+    if not 0 <= target <= 0xFF:
+        raise ValueError(f"band profile out of range: {value!r}")
+    return target
+
+
+def resolve_targets(targets, infos=None, cache=None):
+    """Map each target, a port name or a USB serial number, to its AT port (None if not found)
+
+    Unknown interfaces of all the serial numbers are probed together in one concurrent pass.
+    """
+    if infos is None:
+        infos = serial.tools.list_ports.comports()
+    infos = list(infos)
+    devices = {info.device for info in infos}
+    by_serial = {}
+    for info in infos:
+        key = device_key(info)
+        if key:
+            by_serial.setdefault(key, []).append(info)
+
+    resolved = {}
+    serials = []
+    for target in targets:
+        if target in devices or PORT_RE.match(target):
+            resolved[target] = target
+        else:
+            serials.append(target)
+    if not serials:
+        return resolved
+
+    cache = cache or RoleCache()
+    unknown = [info for target in serials for info in by_serial.get(target, ()) if cache.lookup(info) is None]
+    if unknown:
+        roles = detect_roles(unknown)
+        for info in unknown:
+            if roles[info.device] not in (ROLE_BUSY, ROLE_UNKNOWN):
+                cache.remember(info, roles[info.device])
+        cache.save()
+    for target in serials:
+        resolved[target] = cache.find_at_port(by_serial.get(target, ()))
+    return resolved
+
+
+class FleetResult:
+    """Band profile check or change on one modem"""
+
+    def __init__(self, target, port=None):
+        self.target = target
+        self.port = port
+        self.baudrate = None
+        self.before = None
+        self.after = None
+        self.changed = False
+        self.registered = None
+        self.read_time = 0.0
+        self.write_time = 0.0
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.registered is not False
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return "error"
+        if self.changed:
+            return "changed" if self.registered is not False else "unregistered"
+        return "unchanged" if self.after is not None else "differs"
+
+    def to_dict(self):
+        return {
+            "target": self.target,
+            "port": self.port,
+            "ok": self.ok,
+            "status": self.status,
+            "error": self.error,
+            "baudrate": self.baudrate,
+            "before": f"{self.before:02X}" if self.before is not None else None,
+            "after": f"{self.after:02X}" if self.after is not None else None,
+            "registered": self.registered,
+            "read_time": round(self.read_time, 4),
+            "write_time": round(self.write_time, 4),
+        }
+
+
+class FleetBandApply:
+    """Brings many modems to one band profile: parallel read, diff, parallel write of the differing ones
+
+    Both phases run every modem at once, so the run takes as long as the slowest modem
+    rather than the sum of all of them. Modems already on the profile are never written.
+    """
+
+    def __init__(self, band, baudrate=DEFAULT_BAUDRATE, unlock_password=None, wait_registration=True,
+                 registration_timeout=REGISTRATION_TIMEOUT, max_workers=MAX_WORKERS):
+        self.band = band
+        # None - определить скорость каждого модема автоматически
+        self.baudrate = baudrate
+        self.unlock_password = unlock_password
+        self.wait_registration = wait_registration
+        self.registration_timeout = registration_timeout
+        self.max_workers = max_workers
+        self.timings = {}
+
+    def _read(self, result):
+        started = time.monotonic()
+        transport = None
+        try:
+            rate = self.baudrate or detect_baudrate(result.port)
+            if rate is None:
+                raise ConnectionError("no AT response at any baud rate")
+            result.baudrate = rate
+            transport = ATTransport(result.port, rate).open()
+            manager = BandManager(transport, self.unlock_password, self.registration_timeout)
+            result.before = manager.query_band()
+            return manager
+        except Exception as e:
+            result.error = str(e)
+            if transport is not None:
+                transport.close()
+            return None
+        finally:
+            result.read_time = time.monotonic() - started
+
+    def _write(self, result, manager):
+        started = time.monotonic()
+        try:
+            # Диапазон только что прочитан в первой фазе, второй раз модем не спрашиваем
+            band_result = manager.apply(self.band, self.wait_registration, current=result.before)
+            result.after = band_result.after
+            result.changed = band_result.changed
+            result.registered = band_result.registered
+        except Exception as e:
+            result.error = str(e)
+        finally:
+            result.write_time = time.monotonic() - started
+
+    def run(self, targets, dry_run=False, resolved=None):
+        """Results in target order; with dry_run only the read and the diff are done"""
+        started = time.monotonic()
+        if resolved is None:
+            resolved = resolve_targets(targets)
+        results = []
+        seen = {}
+        for target in dict.fromkeys(targets):
+            result = FleetResult(target, resolved.get(target))
+            if result.port is None:
+                result.error = "no AT port found for this target"
+            elif result.port in seen:
+                # Серийный номер и имя порта одного модема: второй раз порт не открыть
+                result.error = f"same modem as {seen[result.port]}"
+            else:
+                seen[result.port] = target
+            results.append(result)
+        self.timings = {"resolve": time.monotonic() - started}
+
+        active = [result for result in results if result.error is None]
+        managers = []
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(len(active), self.max_workers)),
+                                    thread_name_prefix="fleet") as executor:
+                phase = time.monotonic()
+                managers = list(executor.map(self._read, active))
+                self.timings["read"] = time.monotonic() - phase
+
+                differing = []
+                for result, manager in zip(active, managers):
+                    if manager is None:
+                        continue
+                    if result.before == self.band:
+                        result.after = result.before
+                    else:
+                        differing.append((result, manager))
+
+                phase = time.monotonic()
+                if not dry_run:
+                    list(executor.map(lambda pair: self._write(*pair), differing))
+                self.timings["write"] = time.monotonic() - phase
+        finally:
+            for manager in managers:
+                if manager is not None:
+                    manager.transport.close()
+        self.timings["total"] = time.monotonic() - started
+        # Сколько заняло бы то же самое по одному модему
+        self.timings["sequential"] = sum(result.read_time + result.write_time for result in results)
+        return results
+
+
+def print_results(results, timings, band, out=sys.stdout):
+    out.write(f"{'TARGET':<24} {'PORT':<16} {'BEFORE':>6} {'AFTER':>5}  {'STATUS':<12} {'READ':>7} {'WRITE':>7}\n")
+    for result in results:
+        before = f"{result.before:02X}" if result.before is not None else "-"
+        after = f"{result.after:02X}" if result.after is not None else "-"
+        out.write(f"{result.target:<24} {result.port or '-':<16} {before:>6} {after:>5}  {result.status:<12} "
+                  f"{result.read_time:>6.2f}s {result.write_time:>6.2f}s\n")
+        if result.error:
+            out.write(f"  Error: {result.error}\n")
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+    out.write(f"Profile {band:02X}: {summary}\n")
+    out.write(f"Time: read {timings.get('read', 0):.2f}s, write {timings.get('write', 0):.2f}s, "
+              f"total {timings.get('total', 0):.2f}s (one by one: {timings.get('sequential', 0):.2f}s)\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Apply a band profile to many modems, writing only those that differ")
+    parser.add_argument("profile", help="band index, e.g. 00, 01, 09 or AT!BAND=09")
+    parser.add_argument("targets", nargs="*", help="serial ports or USB serial numbers")
+    parser.add_argument("-f", "--targets-file", help="file with one port or serial number per line")
+    parser.add_argument("-b", "--baudrate", type=baudrate_arg, default=DEFAULT_BAUDRATE,
+                        help="port speed or 'auto' to detect it per modem")
+    parser.add_argument("--unlock-password", help="password for AT!ENTERCND before writing the band")
+    parser.add_argument("--no-wait", action="store_true", help="do not wait for network re-registration")
+    parser.add_argument("--registration-timeout", type=float, default=REGISTRATION_TIMEOUT)
+    parser.add_argument("--dry-run", action="store_true", help="only read the modems and show the diff")
+    parser.add_argument("-j", "--workers", type=int, default=MAX_WORKERS, help="maximum modems handled at once")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser
+
+
+def main(argv=None):
+    # Ключи можно ставить и между портами
+    args = build_parser().parse_intermixed_args(argv)
+    try:
+        band = parse_profile(args.profile)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    targets = list(args.targets)
+    if args.targets_file:
+        targets += read_ports_file(args.targets_file)
+    if not targets:
+        print("Error: no ports or serial numbers given", file=sys.stderr)
+        return 2
+
+    fleet = FleetBandApply(band, args.baudrate, args.unlock_password, not args.no_wait,
+                           args.registration_timeout, args.workers)
+    results = fleet.run(targets, args.dry_run)
+    if args.json:
+        json.dump({"profile": f"{band:02X}", "dry_run": args.dry_run,
+                   "timings": {name: round(value, 4) for name, value in fleet.timings.items()},
+                   "modems": [result.to_dict() for result in results]},
+                  sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print_results(results, fleet.timings, band)
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# line_framer.py
+
+# Строка без перевода строки длиннее этого - мусор (бинарный поток, DM-порт), отбрасываем
+DEFAULT_MAX_LINE = 1024 * 1024
+
+
+class LineFramer:
+    """Splits a byte stream into text lines inside one reusable bytearray
+
+    Lines are decoded straight from a memoryview of the buffer, each byte once. A line ends
+    with an ASCII LF, so a multi-byte UTF-8 sequence split between reads simply stays in the
+    buffer until the rest of its line arrives.
+    """
+
+    def __init__(self, max_line=DEFAULT_MAX_LINE, encoding='utf-8'):
+        self.max_line = max_line
+        self.encoding = encoding
+        self.buffer = bytearray()
+        # Начало неразобранной части и позиция, с которой продолжать поиск LF
+        self.start = 0
+        self.scan = 0
+        self.dropped = 0
+
+    def feed(self, data):
+        self.buffer += data
+        if len(self.buffer) - self.start > self.max_line and self.buffer.find(b"\n", self.scan) < 0:
+            self.dropped += len(self.buffer) - self.start
+            self.reset()
+
+    def next_line(self):
+        """Next complete non-empty line with surrounding whitespace stripped, or None"""
+        buffer = self.buffer
+        while True:
+            end = buffer.find(b"\n", self.scan)
+            if end < 0:
+                self.scan = len(buffer)
+                self._compact()
+                return None
+            with memoryview(buffer) as view:
+                line = str(view[self.start:end], self.encoding, 'ignore').strip()
+            self.start = self.scan = end + 1
+            if line:
+                return line
+
+    def lines(self):
+        return iter(self.next_line, None)
+
+    def pending(self):
+        """Bytes of the unfinished last line"""
+        return bytes(self.buffer[self.start:])
+
+    def reset(self):
+        self.buffer.clear()
+        self.start = 0
+        self.scan = 0
+
+    def _compact(self):
+        # Сдвиг только хвоста недописанной строки, разобранные строки не копируются
+        if self.start:
+            del self.buffer[:self.start]
+            self.scan -= self.start
+            self.start = 0
@@ -0,0 +1,53 @@
+# modem_console.py
+from status_model import StatusModel
+
+
+class ModemConsole:
+    """ModemSetup2's receive path without tkinter: received lines, status accounting and the output pane
+
+    Methods run on the UI thread. The window supplies a dispatcher with call_soon() and an
+    OutputSink, so the same code also runs headless in session_replay.
+    """
+
+    def __init__(self, dispatcher, output_sink, status=None):
+        self.dispatcher = dispatcher
+        self.output_sink = output_sink
+        self.status = status if status is not None else StatusModel()
+        self.urc_subscription = None
+
+    def start_reader(self, transport, on_error):
+        # Порт читает поток транспорта: ответ команды собирает execute_spooled(), в вывод
+        # через dispatcher идут только строки вне ответа (URC)
+        transport.start_reader(on_error=lambda e: self.dispatcher.call_soon(on_error, e))
+        self.urc_subscription = transport.subscribe(
+            callback=lambda line: self.dispatcher.call_soon(self.read_data, line))
+
+    def stop_reader(self, transport):
+        if self.urc_subscription is not None:
+            self.urc_subscription.close()
+            self.urc_subscription = None
+        transport.stop_reader()
+
+    def command_sent(self, command):
+        self.append_output(f"> {command}")
+        self.status.command_sent(command)
+
+    def read_data(self, data):
+        """Unsolicited line received outside any command's response"""
+        self.append_output(f"{data}")
+
+    def show_response(self, spool):
+        """Reply collected by execute_spooled(): the full text, or a head/tail preview if it spilled to disk"""
+        self.status.data_received(spool.size + spool.count)
+        self.status.command_finished()
+        self.append_output(spool.text())
+
+    def show_result(self, text):
+        self.status.command_finished()
+        self.append_output(text)
+
+    def append_output(self, text):
+        self.output_sink.append(text)
+
+    def clear_output(self):
+        self.output_sink.clear()
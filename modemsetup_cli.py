@@ -0,0 +1,118 @@
+# modemsetup_cli.py
+import argparse
+import importlib
+import json
+import sys
+from at_transport import ATTransport, DEFAULT_BAUDRATE, DEFAULT_COMMAND_TIMEOUT
+
+# Подкоманды из других модулей загружаются только при вызове: запуск остаётся быстрым
+TOOLS = {
+    "script": ("at_script", "run a script file on one modem"),
+    "run": ("at_orchestrator", "run commands or a script on many modems at once"),
+    "roles": ("port_roles", "show the role (AT/DM/NMEA) of every serial port"),
+    "autobaud": ("autobaud", "detect or raise the baud rate"),
+    "telemetry": ("telemetry_recorder", "record or query signal telemetry"),
+    "capture": ("traffic_capture", "print recorded raw traffic"),
+    "replay": ("session_replay", "record a session or replay it"),
+    "daemon": ("port_daemon", "share ports between programs through a local daemon"),
+    "bands": ("fleet_band", "apply a band profile to many modems, only where it differs"),
+}
+GUI_MODULES = ("ModemSetup", "ModemSetup2", "sendCommand", "sendCommand2", "sendCommandTest")
+
+
+def baudrate_value(value):
+    if value == "auto":
+        return value
+    try:
+        rate = int(value)
+    except ValueError:
+        rate = 0
+    if rate <= 0:
+        raise argparse.ArgumentTypeError(f"expected a baud rate or 'auto', got {value!r}")
+    return rate
+
+
+def send(argv):
+    parser = argparse.ArgumentParser(prog="modemsetup-cli send", description="Send AT commands to one modem")
+    parser.add_argument("commands", nargs="+")
+    parser.add_argument("-p", "--port", required=True)
+    parser.add_argument("-b", "--baudrate", type=baudrate_value, default=DEFAULT_BAUDRATE, help="port speed or 'auto'")
+    parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_COMMAND_TIMEOUT)
+    parser.add_argument("--json", action="store_true", help="print responses as JSON")
+    args = parser.parse_args(argv)
+
+    if args.baudrate == "auto":
+        from autobaud import detect_baudrate
+        baudrate = detect_baudrate(args.port)
+        if baudrate is None:
+            print(f"Error: {args.port} does not answer AT at any baud rate", file=sys.stderr)
+            return 2
+    else:
+        baudrate = args.baudrate
+
+    out = sys.stdout
+    responses = []
+    try:
+        with ATTransport(args.port, baudrate) as transport:
+            for command in args.commands:
+                if args.json:
+                    responses.append(transport.execute(command, args.timeout))
+                    continue
+                # Строки печатаются по мере прихода, большой ответ не копится в памяти
+                response = transport.execute(command, args.timeout, on_line=lambda line: out.write(line + "\n"))
+                responses.append(response)
+                if response.timed_out:
+                    out.write("Timeout\n")
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        json.dump([{"command": r.command, "final": r.final, "lines": r.lines, "elapsed": round(r.elapsed, 4)}
+                   for r in responses], out, indent=2, ensure_ascii=False)
+        out.write("\n")
+    return 0 if all(response.ok for response in responses) else 1
+
+
+def gui(argv):
+    parser = argparse.ArgumentParser(prog="modemsetup-cli gui", description="Start one of the windowed tools")
+    parser.add_argument("name", nargs="?", default="ModemSetup", choices=GUI_MODULES)
+    args = parser.parse_args(argv)
+    if getattr(sys, "frozen", False):
+        # Собранная консольная утилита идёт без PyQt5 и tkinter
+        print(f"Error: this build has no GUI, start {args.name} from its own executable or from source",
+              file=sys.stderr)
+        return 2
+    # PyQt5/tkinter загружаются только здесь
+    import runpy
+    runpy.run_module(args.name, run_name="__main__")
+    return 0
+
+
+def usage(out=sys.stdout):
+    out.write("usage: modemsetup-cli COMMAND [ARGS]\n\n")
+    out.write(f"  {'send':<10} send AT commands to one modem\n")
+    for name, (_, help_text) in TOOLS.items():
+        out.write(f"  {name:<10} {help_text}\n")
+    out.write(f"  {'gui':<10} start a windowed tool ({', '.join(GUI_MODULES)})\n")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        usage()
+        return 0 if argv else 2
+    name, rest = argv[0], argv[1:]
+    if name == "send":
+        return send(rest)
+    if name == "gui":
+        return gui(rest)
+    if name in TOOLS:
+        return importlib.import_module(TOOLS[name][0]).main(rest)
+    print(f"Error: unknown command {name!r}", file=sys.stderr)
+    usage(sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
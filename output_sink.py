@@ -0,0 +1,122 @@
+# output_sink.py
+from abc import ABC, abstractmethod
+from collections import deque
+
+DEFAULT_MAX_LINES = 5000
+# ~60 кадров в секунду
+FRAME_INTERVAL_MS = 16
+
+
+class OutputSink(ABC):
+    """Bounded text buffer flushed into an output widget at most once per frame"""
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, frame_ms=FRAME_INTERVAL_MS):
+        self.max_lines = max_lines
+        self.frame_ms = frame_ms
+        self.pending = deque()
+        self.pending_lines = 0
+        self.flush_scheduled = False
+
+    def write(self, text):
+        if not text:
+            return
+        self.pending.append(text)
+        self.pending_lines += text.count("\n")
+        # Старые фрагменты всё равно не поместятся в виджет - отбрасываем сразу
+        while self.pending_lines > self.max_lines and len(self.pending) > 1:
+            self.pending_lines -= self.pending.popleft().count("\n")
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self._schedule()
+
+    def append(self, line):
+        self.write(line + "\n")
+
+    def flush(self):
+        self.flush_scheduled = False
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending.clear()
+        self.pending_lines = 0
+        self._render(text)
+
+    def clear(self):
+        self.pending.clear()
+        self.pending_lines = 0
+        self._clear()
+
+    @abstractmethod
+    def _schedule(self):
+        """Arrange for flush() to run one frame later"""
+
+    @abstractmethod
+    def _render(self, text):
+        """Append text to the widget, keeping at most max_lines lines"""
+
+    @abstractmethod
+    def _clear(self):
+        """Empty the widget"""
+
+
+class TkOutputSink(OutputSink):
+    """Output sink for a read-only tk.Text widget"""
+
+    def __init__(self, text_widget, max_lines=DEFAULT_MAX_LINES, frame_ms=FRAME_INTERVAL_MS):
+        super().__init__(max_lines, frame_ms)
+        self.widget = text_widget
+
+    def _schedule(self):
+        self.widget.after(self.frame_ms, self.flush)
+
+    def _render(self, text):
+        widget = self.widget
+        widget.config(state="normal")
+        widget.insert("end", text)
+        last_line = int(widget.index("end-1c").split(".")[0])
+        if last_line > self.max_lines:
+            widget.delete("1.0", f"{last_line - self.max_lines}.0")
+        widget.config(state="disabled")
+        widget.see("end")  # Autoscroll to the bottom
+
+    def _clear(self):
+        self.widget.config(state="normal")
+        self.widget.delete("1.0", "end")
+        self.widget.config(state="disabled")
+
+
+class QtOutputSink(OutputSink):
+    """Output sink for a QPlainTextEdit, the widget itself drops blocks over the cap"""
+
+    def __init__(self, text_edit, max_lines=DEFAULT_MAX_LINES, frame_ms=FRAME_INTERVAL_MS):
+        super().__init__(max_lines, frame_ms)
+        # PyQt5 нужен только Qt-окнам
+        from PyQt5.QtCore import QTimer
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+        self.widget = text_edit
+        self.widget.setMaximumBlockCount(max_lines)
+        self.newline_pending = False
+
+    def _schedule(self):
+        self.timer.start(self.frame_ms)
+
+    def _render(self, text):
+        from PyQt5.QtGui import QTextCursor
+        if self.newline_pending:
+            text = "\n" + text
+        # Завершающий перевод строки откладываем, чтобы внизу не было пустой строки
+        self.newline_pending = text.endswith("\n")
+        if self.newline_pending:
+            text = text[:-1]
+        # Отдельный курсор документа не сбивает выделение пользователя
+        cursor = QTextCursor(self.widget.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        scroll_bar = self.widget.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
+    def _clear(self):
+        self.newline_pending = False
+        self.widget.clear()
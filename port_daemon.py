@@ -0,0 +1,720 @@
+# port_daemon.py
+import argparse
+import itertools
+import json
+import os
+import queue
+import selectors
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from at_transport import ATResponse, ATTransport, DEFAULT_BAUDRATE, DEFAULT_COMMAND_TIMEOUT
+from command_scheduler import CommandCancelled, CommandScheduler, INTERACTIVE, priority_value
+from line_framer import LineFramer
+
+SOCKET_ENV = "MODEMSETUP_DAEMON_SOCKET"
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "modemsetup", "daemon.sock")
+RECV_SIZE = 64 * 1024
+MAX_REQUEST = 1024 * 1024
+# Клиент, который не читает свои сообщения, отключается, а не копит память демона
+MAX_OUTBOX = 8 * 1024 * 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+PORT_ERROR = -32000
+CANCELLED = -32001
+
+# Ответ на запрос придёт позже, из потока порта
+PENDING = object()
+
+
+def socket_path(path=None):
+    return path or os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET
+
+
+def encode_message(message):
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode('utf-8') + b"\n"
+
+
+def notification(method, params):
+    return {"jsonrpc": "2.0", "method": method, "params": params}
+
+
+def error_message(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def response_dict(response):
+    return {"command": response.command, "final": response.final, "lines": response.lines,
+            "elapsed": round(response.elapsed, 4)}
+
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class PortWorker:
+    """Owns one port's transport and runs the commands of all clients on it through a priority scheduler
+
+    Opening and closing the port can block, so both run on helper threads; commands
+    submitted meanwhile wait in the scheduler queue.
+    """
+
+    def __init__(self, port, baudrate=DEFAULT_BAUDRATE, on_failed=None):
+        self.port = port
+        self.transport = ATTransport(port, baudrate)
+        self.scheduler = CommandScheduler(self.transport)
+        self.on_failed = on_failed
+        self.open_error = None
+        self.opener = None
+
+    @property
+    def failed(self):
+        # Порт не открылся или читатель остановился по ошибке (модем отключили) - открыть заново
+        return self.open_error is not None or self.transport.reader_error is not None
+
+    @property
+    def state(self):
+        if self.failed:
+            return "failed"
+        return "open" if self.scheduler.thread.is_alive() else "opening"
+
+    def start(self, previous=None):
+        """Open the port on a helper thread, after the previous worker of the port has let it go"""
+        self.opener = threading.Thread(target=self._open, args=(previous,), daemon=True, name=f"open-{self.port}")
+        self.opener.start()
+        return self
+
+    def _open(self, previous):
+        if previous is not None:
+            previous.join()
+        try:
+            self.transport.start_reader()
+        except Exception as e:
+            self.open_error = e
+            self.transport.close()
+            # Ожидающие команды получают ошибку открытия порта
+            self.scheduler.close()
+            if self.on_failed is not None:
+                self.on_failed(self, f"cannot open: {e}")
+            return
+        self.scheduler.start()
+
+    def stop(self, timeout=DEFAULT_COMMAND_TIMEOUT):
+        """Close the port; blocks until the running command ends, call it off the selector thread"""
+        if self.opener is not None:
+            self.opener.join()
+        self.scheduler.close(timeout)
+        self.transport.close()
+
+
+class ClientConnection:
+    """One connected client: its request framer, unsent output and URC subscriptions"""
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.framer = LineFramer(MAX_REQUEST)
+        self.outbox = bytearray()
+        # id подписки -> (порт, URCSubscription)
+        self.subscriptions = {}
+        # id запроса -> CommandTicket ещё не выполненной команды
+        self.pending = {}
+        self.closed = False
+
+
+class PortDaemon:
+    """Keeps serial ports open and serves them to many local clients over JSON-RPC on a Unix socket
+
+    Requests and replies are JSON-RPC 2.0 objects, one per line. Socket I/O runs on one
+    selector thread; each port has a CommandScheduler that runs queued commands one at a
+    time in priority order, so clients never interleave on a modem. URCs are pushed to
+    subscribers as "urc" notifications.
+    """
+
+    def __init__(self, path=None, baudrate=DEFAULT_BAUDRATE):
+        self.path = socket_path(path)
+        self.baudrate = baudrate
+        self.selector = selectors.DefaultSelector()
+        self.server = None
+        self.clients = {}
+        self.workers = {}
+        # Потоки, закрывающие освобождённые порты: новый воркер порта ждёт свой перед открытием
+        self.closing = {}
+        # Сообщения из потоков портов и подписок, отправляются в потоке селектора
+        self.outgoing = queue.SimpleQueue()
+        self.wake_r = self.wake_w = None
+        self.client_numbers = itertools.count(1)
+        self.subscription_ids = itertools.count(1)
+        self.running = False
+        self.methods = {
+            "execute": self._rpc_execute,
+            "cancel": self._rpc_cancel,
+            "subscribe": self._rpc_subscribe,
+            "unsubscribe": self._rpc_unsubscribe,
+            "ports": self._rpc_ports,
+            "close_port": self._rpc_close_port,
+        }
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._remove_stale_socket()
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Команды модему может слать только владелец демона; права задаются уже при создании сокета
+        umask = os.umask(0o177)
+        try:
+            self.server.bind(self.path)
+        finally:
+            os.umask(umask)
+        self.server.listen(64)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ, self._accept)
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, self._drain_outgoing)
+        self.running = True
+        return self
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            # Файл остался от упавшего демона
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"another daemon is already serving {self.path}")
+
+    def serve_forever(self):
+        if not self.running:
+            self.start()
+        try:
+            while self.running:
+                for key, events in self.selector.select(timeout=1.0):
+                    key.data(key.fileobj, events)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Ask the selector loop to exit, safe from any thread or a signal handler"""
+        self.running = False
+        self._wake()
+
+    def shutdown(self):
+        self.running = False
+        for client in list(self.clients.values()):
+            self._drop(client)
+        for port in list(self.workers):
+            self._release(port, "daemon stopped")
+        for thread in list(self.closing.values()):
+            thread.join()
+        self.closing.clear()
+        if self.server is not None:
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self.wake_r is not None:
+            self.selector.unregister(self.wake_r)
+            self.wake_r.close()
+            self.wake_w.close()
+            self.wake_r = self.wake_w = None
+        self.selector.close()
+
+    # Поток селектора
+
+    def _accept(self, server, events):
+        try:
+            sock, _ = server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = ClientConnection(sock, f"client-{next(self.client_numbers)}")
+        self.clients[sock] = client
+        self.selector.register(sock, selectors.EVENT_READ, self._client_event)
+
+    def _client_event(self, sock, events):
+        client = self.clients.get(sock)
+        if client is None:
+            return
+        if events & selectors.EVENT_WRITE:
+            self._flush(client)
+        if events & selectors.EVENT_READ and not client.closed:
+            self._receive(client)
+
+    def _receive(self, client):
+        try:
+            data = client.sock.recv(RECV_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return
+        client.framer.feed(data)
+        for line in client.framer.lines():
+            self._handle(client, line)
+            if client.closed:
+                return
+
+    def _handle(self, client, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self._send(client, error_message(None, PARSE_ERROR, "parse error"))
+            return
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if not _valid_id(request_id):
+            # id служит ключом ожидающих команд, поэтому только строка или целое число
+            self._send(client, error_message(None, INVALID_REQUEST, "id must be a string, an integer or null"))
+            return
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RPCError(INVALID_REQUEST, "invalid request")
+            handler = self.methods.get(request["method"])
+            if handler is None:
+                raise RPCError(METHOD_NOT_FOUND, f"unknown method {request['method']!r}")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params must be an object")
+            result = handler(client, request_id, params)
+        except RPCError as e:
+            self._send(client, error_message(request_id, e.code, str(e)))
+            return
+        except Exception as e:
+            # Ошибка в обработке одного запроса не должна останавливать демон для всех клиентов
+            self._send(client, error_message(request_id, INTERNAL_ERROR, f"internal error: {e!r}"))
+            return
+        # Запрос без id - уведомление, ответ на него не отправляется
+        if result is not PENDING and request_id is not None:
+            self._send(client, {"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def _send(self, client, message):
+        if client.closed:
+            return
+        client.outbox += encode_message(message)
+        if len(client.outbox) > MAX_OUTBOX:
+            self._drop(client)
+            return
+        self._flush(client)
+
+    def _flush(self, client):
+        try:
+            sent = client.sock.send(client.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(client)
+            return
+        del client.outbox[:sent]
+        # Ждём готовности на запись только пока есть неотправленное
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbox else 0)
+        if self.selector.get_key(client.sock).events != events:
+            self.selector.modify(client.sock, events, self._client_event)
+
+    def _drop(self, client):
+        if client.closed:
+            return
+        client.closed = True
+        for _, subscription in client.subscriptions.values():
+            subscription.close()
+        client.subscriptions.clear()
+        # Команды ушедшего клиента, ещё стоящие в очереди, до модема не доходят
+        for ticket in list(client.pending.values()):
+            ticket.cancel("client disconnected")
+        client.pending.clear()
+        self.clients.pop(client.sock, None)
+        self.selector.unregister(client.sock)
+        client.sock.close()
+
+    def _wake(self):
+        if self.wake_w is None:
+            return
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            # Буфер полон - селектор и так проснётся
+            pass
+
+    def _drain_outgoing(self, sock, events):
+        try:
+            while sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                client, message = self.outgoing.get_nowait()
+            except queue.Empty:
+                return
+            if client is None:
+                # Задача из другого потока, которой нужно состояние селектора
+                message()
+            else:
+                self._send(client, message)
+
+    def post(self, client, message):
+        """Queue a message for a client from any thread"""
+        if not client.closed:
+            self.outgoing.put((client, message))
+            self._wake()
+
+    def call_soon(self, callback):
+        """Run a callback on the selector thread"""
+        self.outgoing.put((None, callback))
+        self._wake()
+
+    # Порты
+
+    def _worker(self, port, baudrate=None):
+        worker = self.workers.get(port)
+        if worker is not None and worker.failed:
+            self._release(port, "port failed")
+            worker = None
+        if worker is None:
+            worker = PortWorker(port, baudrate or self.baudrate, self._worker_failed)
+            self.workers[port] = worker
+            worker.start(self.closing.get(port))
+        return worker
+
+    def _worker_failed(self, worker, reason):
+        # Поток открытия: освобождение порта делается в потоке селектора
+        def release():
+            if self.workers.get(worker.port) is worker:
+                self._release(worker.port, reason)
+        self.call_soon(release)
+
+    def _release(self, port, reason):
+        """Detach the port's worker and close it on a helper thread, the selector never waits for it"""
+        worker = self.workers.pop(port, None)
+        if worker is None:
+            return False
+        # Подписки закрытого порта больше ничего не получат, клиенты узнают об этом
+        for client in list(self.clients.values()):
+            for subscription_id, (sub_port, subscription) in list(client.subscriptions.items()):
+                if sub_port == port:
+                    subscription.close()
+                    del client.subscriptions[subscription_id]
+                    self._send(client, notification("port_closed", {
+                        "subscription": subscription_id, "port": port, "reason": reason}))
+        previous = self.closing.get(port)
+
+        def stop():
+            if previous is not None:
+                previous.join()
+            worker.stop()
+            self.call_soon(lambda: self.closing.get(port) is thread and self.closing.pop(port))
+
+        thread = threading.Thread(target=stop, daemon=True, name=f"close-{port}")
+        self.closing[port] = thread
+        thread.start()
+        return True
+
+    # Методы RPC
+
+    def _rpc_execute(self, client, request_id, params):
+        port = _param(params, "port", str)
+        command = _param(params, "command", str)
+        timeout = float(_param(params, "timeout", (int, float), DEFAULT_COMMAND_TIMEOUT))
+        if timeout <= 0:
+            raise RPCError(INVALID_PARAMS, "parameter 'timeout' must be positive")
+        deadline = params.get("deadline")
+        if deadline is not None and (not isinstance(deadline, (int, float)) or isinstance(deadline, bool)):
+            raise RPCError(INVALID_PARAMS, "parameter 'deadline' must be a number of seconds")
+        key = params.get("key")
+        if key is not None and not isinstance(key, str):
+            raise RPCError(INVALID_PARAMS, "parameter 'key' must be a string")
+        priority = params.get("priority", INTERACTIVE)
+        if not isinstance(priority, (str, int)) or isinstance(priority, bool):
+            raise RPCError(INVALID_PARAMS, "parameter 'priority' must be a class name or number")
+        try:
+            priority = priority_value(priority)
+        except ValueError as e:
+            raise RPCError(INVALID_PARAMS, str(e))
+        on_line = None
+        if params.get("stream"):
+            on_line = lambda line: self.post(client, notification("line", {"id": request_id, "line": line}))
+        worker = self._worker(port, _baudrate(params))
+
+        def done(ticket):
+            # Поток планировщика или отменяющий поток: только ставим ответ в очередь
+            if request_id is None:
+                return
+            client.pending.pop(request_id, None)
+            if ticket.cancelled and worker.open_error is not None:
+                message = error_message(request_id, PORT_ERROR, f"{port}: {worker.open_error}")
+            elif ticket.cancelled:
+                message = error_message(request_id, CANCELLED, str(ticket.error))
+            elif ticket.error is not None:
+                message = error_message(request_id, PORT_ERROR, f"{port}: {ticket.error}")
+            else:
+                message = {"jsonrpc": "2.0", "id": request_id, "result": response_dict(ticket.response)}
+            self.post(client, message)
+
+        # Ключ опроса общий для порта: одинаковые опросы разных клиентов тоже схлопываются
+        try:
+            ticket = worker.scheduler.submit(command, priority, timeout, on_line, deadline, key, done)
+        except CommandCancelled as e:
+            raise RPCError(CANCELLED, str(e))
+        if request_id is not None:
+            client.pending[request_id] = ticket
+            # done() мог успеть сработать в потоке планировщика до этой строки
+            if ticket.done.is_set():
+                client.pending.pop(request_id, None)
+        return PENDING
+
+    def _rpc_cancel(self, client, request_id, params):
+        # Снимается только команда, ещё не отправленная модему
+        ticket_id = params.get("id")
+        if not _valid_id(ticket_id) or ticket_id is None:
+            raise RPCError(INVALID_PARAMS, "parameter 'id' must be a string or an integer")
+        ticket = client.pending.get(ticket_id)
+        return ticket is not None and ticket.cancel()
+
+    def _rpc_subscribe(self, client, request_id, params):
+        port = _param(params, "port", str)
+        prefixes = _param(params, "prefixes", list, [])
+        if not all(isinstance(prefix, str) for prefix in prefixes):
+            raise RPCError(INVALID_PARAMS, "prefixes must be strings")
+        worker = self._worker(port, _baudrate(params))
+        subscription_id = next(self.subscription_ids)
+
+        def deliver(line):
+            self.post(client, notification("urc", {"subscription": subscription_id, "port": port, "line": line}))
+
+        client.subscriptions[subscription_id] = (port, worker.transport.subscribe(prefixes, deliver))
+        return {"subscription": subscription_id}
+
+    def _rpc_unsubscribe(self, client, request_id, params):
+        subscription_id = _param(params, "subscription", int)
+        entry = client.subscriptions.pop(subscription_id, None)
+        if entry is not None:
+            entry[1].close()
+        return entry is not None
+
+    def _rpc_ports(self, client, request_id, params):
+        return [{
+            "port": port,
+            "baudrate": worker.transport.baudrate,
+            "state": worker.state,
+            "subscriptions": len(worker.transport.subscriptions),
+            "failed": worker.failed,
+            **worker.scheduler.stats(),
+        } for port, worker in self.workers.items()]
+
+    def _rpc_close_port(self, client, request_id, params):
+        # Освободить порт для другой программы, например прошивальщика
+        return self._release(_param(params, "port", str), "closed by a client")
+
+
+def _valid_id(value):
+    return value is None or isinstance(value, str) or isinstance(value, int) and not isinstance(value, bool)
+
+
+def _baudrate(params):
+    baudrate = params.get("baudrate")
+    if baudrate is not None and (not isinstance(baudrate, int) or isinstance(baudrate, bool) or baudrate <= 0):
+        raise RPCError(INVALID_PARAMS, "parameter 'baudrate' must be a positive integer")
+    return baudrate
+
+
+def _param(params, name, kind, default=None):
+    value = params.get(name, default)
+    if value is None or not isinstance(value, kind) or isinstance(value, bool) and kind is not bool:
+        raise RPCError(INVALID_PARAMS, f"parameter {name!r} is missing or has a wrong type")
+    return value
+
+
+class DaemonClient:
+    """Blocking client of the port daemon, execute() returns ATResponse like a transport"""
+
+    def __init__(self, path=None, timeout=None):
+        self.path = socket_path(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.path)
+        self.framer = LineFramer(MAX_OUTBOX)
+        self.ids = itertools.count(1)
+        # Уведомления, пришедшие во время ожидания ответа
+        self.notifications = deque()
+
+    def _read_message(self):
+        while True:
+            line = self.framer.next_line()
+            if line is not None:
+                return json.loads(line)
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionError("daemon closed the connection")
+            self.framer.feed(data)
+
+    def call(self, method, params=None, on_notification=None):
+        """Send a request and wait for its result; on_notification gets the notifications that carry its id"""
+        request_id = next(self.ids)
+        self.sock.sendall(encode_message({"jsonrpc": "2.0", "id": request_id, "method": method,
+                                          "params": params or {}}))
+        while True:
+            message = self._read_message()
+            if "method" in message:
+                if on_notification is not None and message["params"].get("id") == request_id:
+                    on_notification(message)
+                else:
+                    self.notifications.append(message)
+            elif message.get("id") == request_id:
+                if "error" in message:
+                    raise RPCError(message["error"]["code"], message["error"]["message"])
+                return message["result"]
+
+    def execute(self, port, command, timeout=DEFAULT_COMMAND_TIMEOUT, on_line=None, priority="interactive",
+                deadline=None, key=None):
+        """Run a command on the daemon's port; priority, deadline and key are passed to its scheduler"""
+        params = {"port": port, "command": command, "timeout": timeout, "stream": on_line is not None,
+                  "priority": priority, "deadline": deadline, "key": key}
+        on_notification = (lambda message: on_line(message["params"]["line"])) if on_line else None
+        result = self.call("execute", params, on_notification)
+        return ATResponse(result["command"], result["lines"], result["final"], result["elapsed"])
+
+    def send(self, port, command, timeout=DEFAULT_COMMAND_TIMEOUT):
+        return self.execute(port, command, timeout).text
+
+    def subscribe(self, port, prefixes=()):
+        return self.call("subscribe", {"port": port, "prefixes": list(prefixes)})["subscription"]
+
+    def unsubscribe(self, subscription_id):
+        return self.call("unsubscribe", {"subscription": subscription_id})
+
+    def ports(self):
+        return self.call("ports")
+
+    def close_port(self, port):
+        return self.call("close_port", {"port": port})
+
+    def next_notification(self, timeout=None):
+        """Next URC or port_closed notification, None if nothing arrived within the timeout"""
+        if self.notifications:
+            return self.notifications.popleft()
+        previous = self.sock.gettimeout()
+        self.sock.settimeout(timeout)
+        try:
+            message = self._read_message()
+        except socket.timeout:
+            return None
+        finally:
+            self.sock.settimeout(previous)
+        return message
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Share serial ports between programs through a local daemon")
+    parser.add_argument("-s", "--socket", help=f"socket path (default ${SOCKET_ENV} or {DEFAULT_SOCKET})")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    serve = sub.add_parser("serve", help="run the daemon")
+    serve.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE)
+
+    send = sub.add_parser("send", help="send commands through the daemon")
+    send.add_argument("commands", nargs="+")
+    send.add_argument("-p", "--port", required=True)
+    send.add_argument("-t", "--timeout", type=float, default=DEFAULT_COMMAND_TIMEOUT)
+    send.add_argument("--priority", choices=("interactive", "provisioning", "telemetry"), default="interactive")
+
+    watch = sub.add_parser("watch", help="print a port's URCs until Ctrl+C")
+    watch.add_argument("prefixes", nargs="*", help="URC prefixes, e.g. +CEREG: (default all)")
+    watch.add_argument("-p", "--port", required=True)
+
+    sub.add_parser("ports", help="list the ports the daemon holds")
+    release = sub.add_parser("release", help="close a port so another program can open it")
+    release.add_argument("port")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "serve":
+        daemon = PortDaemon(args.socket, args.baudrate)
+        try:
+            daemon.start()
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+        print(f"Serving on {daemon.path}", file=sys.stderr)
+        daemon.serve_forever()
+        return 0
+
+    try:
+        client = DaemonClient(args.socket)
+    except OSError as e:
+        print(f"Error: daemon is not running on {socket_path(args.socket)}: {e}", file=sys.stderr)
+        return 2
+    with client:
+        try:
+            if args.action == "send":
+                ok = True
+                for command in args.commands:
+                    response = client.execute(args.port, command, args.timeout,
+                                              on_line=lambda line: print(line, flush=True),
+                                              priority=args.priority)
+                    if response.timed_out:
+                        print("Timeout")
+                    ok = ok and response.ok
+                return 0 if ok else 1
+            if args.action == "watch":
+                client.subscribe(args.port, args.prefixes)
+                try:
+                    while True:
+                        message = client.next_notification()
+                        params = message["params"]
+                        if message["method"] == "port_closed":
+                            print(f"{params['port']}: closed ({params['reason']})", file=sys.stderr)
+                            return 1
+                        print(f"{time.strftime('%H:%M:%S')} {params['line']}", flush=True)
+                except KeyboardInterrupt:
+                    return 0
+            if args.action == "ports":
+                for info in client.ports():
+                    queued = " ".join(f"{name}={count}" for name, count in info['queued'].items())
+                    print(f"{info['port']:<16} {info['baudrate']:>7} baud  executed {info['executed']:<6} "
+                          f"cancelled {info['cancelled']:<4} queued {queued}  subscriptions {info['subscriptions']}"
+                          f"{'' if info['state'] == 'open' else '  ' + info['state'].upper()}")
+                return 0
+            print("released" if client.close_port(args.port) else "not open")
+            return 0
+        except RPCError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
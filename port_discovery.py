@@ -0,0 +1,191 @@
+# port_discovery.py
+import os
+import select
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import serial
+import serial.tools.list_ports
+from at_transport import open_ports
+
+PROBE_TIMEOUT = 0.5
+CACHE_TTL = 30.0
+
+
+class PortEntry:
+    """Port from list_ports together with the cached result of the last probe"""
+
+    def __init__(self, info):
+        self.info = info
+        self.device = info.device
+        self.description = info.description or "Unknown"
+        self.hwid = info.hwid
+        self.serial_number = getattr(info, "serial_number", None)
+        self.available = None  # None - ещё не проверен или проверка не успела
+        self.checked_at = 0.0
+
+    def __repr__(self):
+        return f"PortEntry({self.device!r}, available={self.available})"
+
+
+def probe_port(device):
+    """True if the port can be opened right now"""
+    try:
+        s = serial.Serial(device, timeout=0, write_timeout=0)
+        s.close()
+        return True
+    except (OSError, serial.SerialException):
+        return False
+
+
+class PortDiscovery:
+    """Enumerates serial ports and probes them in parallel, caching the results"""
+
+    def __init__(self, probe_timeout=PROBE_TIMEOUT, cache_ttl=CACHE_TTL, max_workers=8):
+        self.probe_timeout = probe_timeout
+        self.cache_ttl = cache_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="probe")
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Re-enumerate ports, returns (added, removed) device names"""
+        infos = {info.device: info for info in serial.tools.list_ports.comports()}
+        with self.lock:
+            removed = [device for device in self.entries if device not in infos]
+            for device in removed:
+                del self.entries[device]
+            added = []
+            for device, info in infos.items():
+                entry = self.entries.get(device)
+                if entry is None or entry.hwid != info.hwid:
+                    self.entries[device] = PortEntry(info)
+                    added.append(device)
+        return added, removed
+
+    def scan(self, probe=True):
+        """Return known ports, probing those whose cached result is missing or stale"""
+        self.refresh()
+        if probe:
+            self.probe_stale()
+        return self.ports()
+
+    def ports(self):
+        with self.lock:
+            return sorted(self.entries.values(), key=lambda entry: entry.device)
+
+    def probe_stale(self):
+        now = time.monotonic()
+        held = set(open_ports())
+        with self.lock:
+            stale = []
+            for entry in self.entries.values():
+                if entry.device in held:
+                    # Порт занят нашим же транспортом - он точно рабочий
+                    entry.available = True
+                    entry.checked_at = now
+                elif entry.available is None or now - entry.checked_at > self.cache_ttl:
+                    stale.append(entry)
+        if not stale:
+            return
+        futures = {self.executor.submit(probe_port, entry.device): entry for entry in stale}
+        # Зависший порт не держит остальных: ждём не дольше probe_timeout,
+        # опоздавшие результаты попадут в кэш при следующем вызове
+        for future in futures:
+            future.add_done_callback(lambda f, entry=futures[future]: self._store(entry, f))
+        wait(futures, timeout=self.probe_timeout)
+
+    def _store(self, entry, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        entry.available = future.result()
+        entry.checked_at = time.monotonic()
+
+    def invalidate(self, device=None):
+        with self.lock:
+            entries = self.entries.values() if device is None else [self.entries.get(device)]
+            for entry in entries:
+                if entry is not None:
+                    entry.available = None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Inotify:
+    """Minimal inotify binding, Linux only"""
+
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+
+    def __init__(self, paths):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for path in paths:
+            if os.path.isdir(path):
+                libc.inotify_add_watch(self.fd, path.encode(), self.IN_CREATE | self.IN_DELETE)
+
+    def wait(self, timeout):
+        """Block until something changed or the timeout passed, returns True on change"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class HotplugWatcher(threading.Thread):
+    """Calls on_change(added, removed) when serial ports appear or disappear"""
+
+    WATCH_PATHS = ("/dev", "/sys/class/tty")
+    # Дать udev время создать все интерфейсы устройства
+    SETTLE_DELAY = 0.3
+
+    def __init__(self, discovery, on_change, poll_interval=2.0):
+        super().__init__(daemon=True, name="hotplug")
+        self.discovery = discovery
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                inotify = _Inotify(self.WATCH_PATHS)
+            except OSError:
+                inotify = None
+        try:
+            while not self.stop_event.is_set():
+                if inotify is not None:
+                    # Просыпаемся только на события /dev и sysfs
+                    if not inotify.wait(self.poll_interval):
+                        continue
+                    self.stop_event.wait(self.SETTLE_DELAY)
+                else:
+                    # Windows/macOS: дешёвое сравнение списка без открытия портов
+                    self.stop_event.wait(self.poll_interval)
+                if self.stop_event.is_set():
+                    break
+                added, removed = self.discovery.refresh()
+                if added or removed:
+                    self.on_change(added, removed)
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def stop(self):
+        self.stop_event.set()
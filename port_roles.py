@@ -0,0 +1,172 @@
+# port_roles.py
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import serial
+import serial.tools.list_ports
+
+ROLE_AT = "AT"
+ROLE_DM = "DM"
+ROLE_NMEA = "NMEA"
+ROLE_UNKNOWN = "unknown"
+ROLE_BUSY = "busy"
+
+PROBE_TIMEOUT = 0.5
+ROLES_FILE = os.path.join(os.path.expanduser("~"), ".modemsetup", "port_roles.json")
+
+NMEA_RE = re.compile(rb"\$G[A-Z]{4},")
+RESULT_RE = re.compile(rb"\r\n(OK|ERROR)\r\n")
+DESCRIPTION_HINTS = (
+    (re.compile(r"\bNMEA\b|\bGPS\b", re.I), ROLE_NMEA),
+    (re.compile(r"\bDM\b|\bDiag", re.I), ROLE_DM),
+    (re.compile(r"\bAT\b|\bModem\b|Application", re.I), ROLE_AT),
+)
+
+
+def device_key(info):
+    """Identify the physical USB device a port belongs to"""
+    if info.serial_number:
+        return info.serial_number
+    if info.location:
+        # "1-1.2:1.3" - порт концентратора без номера интерфейса
+        return info.location.split(":")[0]
+    return None
+
+
+def interface_key(info):
+    """Identify the interface of a port within its USB device, stable across COM renumbering"""
+    if info.location and ":" in info.location:
+        return info.location.split(":")[1]
+    return info.interface or info.device
+
+
+def role_from_description(description):
+    for pattern, role in DESCRIPTION_HINTS:
+        if description and pattern.search(description):
+            return role
+    return ROLE_UNKNOWN
+
+
+def classify_response(data):
+    if RESULT_RE.search(data) or data.strip().endswith((b"OK", b"ERROR")):
+        return ROLE_AT
+    if NMEA_RE.search(data):
+        return ROLE_NMEA
+    if data and (b"\x7e" in data or any(byte < 0x09 or byte > 0x7e for byte in data)):
+        # Бинарный HDLC-поток диагностического интерфейса
+        return ROLE_DM
+    return ROLE_UNKNOWN
+
+
+def probe_role(device, baudrate=115200, timeout=PROBE_TIMEOUT):
+    """Send a bare AT to the port and classify it by what comes back"""
+    try:
+        conn = serial.Serial(device, baudrate, timeout=0.05, write_timeout=timeout)
+    except (OSError, serial.SerialException):
+        return ROLE_BUSY
+    try:
+        conn.reset_input_buffer()
+        conn.write(b"AT\r")
+        data = b""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data += conn.read(max(1, conn.in_waiting))
+            role = classify_response(data)
+            if role == ROLE_AT:
+                return role
+        return classify_response(data)
+    except (OSError, serial.SerialException):
+        return ROLE_BUSY
+    finally:
+        conn.close()
+
+
+def detect_roles(infos, timeout=PROBE_TIMEOUT):
+    """Probe all given ports concurrently, returns {device: role}"""
+    infos = list(infos)
+    if not infos:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(infos), thread_name_prefix="role") as executor:
+        roles = dict(zip((info.device for info in infos),
+                         executor.map(lambda info: probe_role(info.device, timeout=timeout), infos)))
+    for info in infos:
+        if roles[info.device] in (ROLE_BUSY, ROLE_UNKNOWN):
+            hint = role_from_description(info.description)
+            if hint != ROLE_UNKNOWN:
+                roles[info.device] = hint
+    return roles
+
+
+class RoleCache:
+    """Remembers which interface of each USB device answers AT commands"""
+
+    def __init__(self, path=ROLES_FILE):
+        self.path = path
+        self.devices = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.devices = json.load(f)
+        except (OSError, ValueError):
+            self.devices = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.devices, f, indent=2)
+
+    def remember(self, info, role):
+        key = device_key(info)
+        if key is None:
+            return
+        roles = self.devices.setdefault(key, {})
+        roles[interface_key(info)] = role
+
+    def lookup(self, info):
+        key = device_key(info)
+        return self.devices.get(key, {}).get(interface_key(info)) if key else None
+
+    def find_at_port(self, infos):
+        """Device name of the first port remembered as an AT interface, without probing"""
+        for info in infos:
+            if self.lookup(info) == ROLE_AT:
+                return info.device
+        return None
+
+
+def find_at_port(infos=None, probe=True, cache=None):
+    """Pick the AT port among the given ports, probing unknown USB devices once"""
+    if infos is None:
+        infos = serial.tools.list_ports.comports()
+    infos = list(infos)
+    cache = cache or RoleCache()
+    device = cache.find_at_port(infos)
+    if device or not probe:
+        return device
+    unknown = [info for info in infos if cache.lookup(info) is None]
+    roles = detect_roles(unknown)
+    for info in unknown:
+        # Молчащий или занятый порт проверим в следующий раз
+        if roles[info.device] not in (ROLE_BUSY, ROLE_UNKNOWN):
+            cache.remember(info, roles[info.device])
+    cache.save()
+    return cache.find_at_port(infos) or next(
+        (device for device, role in roles.items() if role == ROLE_AT), None)
+
+
+def main(argv=None):
+    infos = serial.tools.list_ports.comports()
+    cache = RoleCache()
+    roles = detect_roles(infos)
+    for info in infos:
+        role = roles[info.device]
+        if role not in (ROLE_BUSY, ROLE_UNKNOWN):
+            cache.remember(info, role)
+        print(f"{info.device}\t{role}\t{device_key(info) or '-'}\t{info.description}")
+    cache.save()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
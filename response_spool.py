@@ -0,0 +1,80 @@
+# response_spool.py
+import os
+import tempfile
+from collections import deque
+from at_transport import DEFAULT_COMMAND_TIMEOUT
+
+# Ответ больше этого уходит во временный файл, в окне - только начало и конец
+SPILL_THRESHOLD = 256 * 1024
+PREVIEW_LINES = 40
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), "modemsetup")
+
+
+class ResponseSpool:
+    """Line consumer for a streamed response: kept in memory while small, spilled to a file when large"""
+
+    def __init__(self, threshold=SPILL_THRESHOLD, head_lines=PREVIEW_LINES, tail_lines=PREVIEW_LINES,
+                 directory=SPOOL_DIR):
+        self.threshold = threshold
+        self.head_lines = head_lines
+        self.directory = directory
+        self.lines = []
+        self.tail = deque(maxlen=tail_lines)
+        self.count = 0
+        self.size = 0
+        self.file = None
+        self.path = None
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def add(self, line):
+        self.count += 1
+        self.size += len(line) + 1
+        if self.file is not None:
+            self.file.write(line + "\n")
+            self.tail.append(line)
+            return
+        self.lines.append(line)
+        if self.size > self.threshold:
+            self._spill()
+
+    def _spill(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile('w', encoding='utf-8', prefix="response-", suffix=".txt",
+                                                dir=self.directory, delete=False)
+        self.path = self.file.name
+        self.file.write("\n".join(self.lines) + "\n")
+        # В памяти остаются только строки для предпросмотра
+        self.tail.extend(self.lines[self.head_lines:])
+        del self.lines[self.head_lines:]
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def text(self):
+        """Whole response if it stayed in memory, otherwise the head/tail preview"""
+        if not self.spilled:
+            return "\n".join(self.lines)
+        return self.preview()
+
+    def preview(self):
+        omitted = self.count - len(self.lines) - len(self.tail)
+        marker = f"... {omitted} lines not shown, {self.size // 1024} KiB in total, full output: {self.path}"
+        return "\n".join(self.lines + [marker] + list(self.tail))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def execute_spooled(transport, command, timeout=DEFAULT_COMMAND_TIMEOUT, threshold=SPILL_THRESHOLD):
+    """Execute a command streaming its lines into a ResponseSpool, returns (response, spool)"""
+    with ResponseSpool(threshold) as spool:
+        response = transport.execute(command, timeout, on_line=spool.add)
+    return response, spool
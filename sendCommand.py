@@ -1,7 +1,10 @@
 import sys
-import serial
+from at_transport import get_transport, close_transport, close_all_transports
+from port_discovery import PortDiscovery, HotplugWatcher
+from output_sink import QtOutputSink
+from response_spool import execute_spooled
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
-                             QLabel, QLineEdit, QPushButton, QTextEdit, QWidget,
+                             QLabel, QLineEdit, QPushButton, QPlainTextEdit, QWidget,
                              QComboBox)
 from PyQt5.QtCore import QThread, pyqtSignal
 
@@ -13,46 +16,36 @@ class SerialThread(QThread):
         super().__init__()
         self.port = port
         self.command = command
-        self.serial_conn = None
 
     def run(self):
         try:
-            self.serial_conn = serial.Serial(self.port, baudrate=115200, timeout=1)
-            if not self.serial_conn.is_open:
-                self.serial_conn.open()
-
-            # Добавляем \r\n к команде, если их нет
-            if not self.command.endswith('\r\n'):
-                self.command += '\r\n'
-
-            self.serial_conn.write(self.command.encode('ascii'))
-            
-            # Читаем ответ
-            response = ""
-            while True:
-                line = self.serial_conn.readline().decode('ascii', errors='ignore').strip()
-                if not line:
-                    break
-                response += line + "\n"
-
-            self.result_received.emit(response)
+            # Порт остаётся открытым между командами; большой ответ уходит в файл,
+            # в окно попадает только начало и конец
+            spool = execute_spooled(get_transport(self.port), self.command)[1]
+            self.result_received.emit(spool.text() + "\n")
 
         except Exception as e:
+            close_transport(self.port)
             self.result_received.emit(f"Error: {str(e)}")
-        finally:
-            if self.serial_conn and self.serial_conn.is_open:
-                self.serial_conn.close()
 
 
 class ATCommandTool(QMainWindow):
+    ports_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AT Command Tool")
         self.setGeometry(100, 100, 600, 400)
         
+        self.discovery = PortDiscovery()
         self.init_ui()
         self.scan_ports()
 
+        # Сигнал переносит событие hotplug из потока наблюдателя в GUI-поток
+        self.ports_changed.connect(self.scan_ports)
+        self.hotplug = HotplugWatcher(self.discovery, lambda added, removed: self.ports_changed.emit())
+        self.hotplug.start()
+
     def init_ui(self):
         main_widget = QWidget()
         layout = QVBoxLayout()
@@ -63,7 +56,7 @@ class ATCommandTool(QMainWindow):
         
         self.port_combo = QComboBox()
         self.refresh_btn = QPushButton("Refresh")
-        self.refresh_btn.clicked.connect(self.scan_ports)
+        self.refresh_btn.clicked.connect(self.refresh_ports)
         
         com_layout.addWidget(self.port_combo)
         com_layout.addWidget(self.refresh_btn)
@@ -82,39 +75,29 @@ class ATCommandTool(QMainWindow):
         layout.addLayout(at_layout)
 
         # Response output
-        self.output = QTextEdit()
+        self.output = QPlainTextEdit()
         self.output.setReadOnly(True)
+        self.output_sink = QtOutputSink(self.output)
         layout.addWidget(self.output)
 
         main_widget.setLayout(layout)
         self.setCentralWidget(main_widget)
 
+    def refresh_ports(self):
+        # Кнопка Refresh перепроверяет все порты, hotplug - только новые
+        self.discovery.invalidate()
+        self.scan_ports()
+
     def scan_ports(self):
         """Scan for available COM ports"""
+        current = self.port_combo.currentText()
         self.port_combo.clear()
-        ports = []
-        
-        # Check common COM ports (Windows)
-        for i in range(1, 21):
-            port_name = f"COM{i}"
-            try:
-                s = serial.Serial(port_name)
-                s.close()
-                ports.append(port_name)
-            except (OSError, serial.SerialException):
-                pass
-        
-        # Check common /dev/tty* ports (Linux/Mac)
-        for port in ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']:
-            try:
-                s = serial.Serial(port)
-                s.close()
-                ports.append(port)
-            except (OSError, serial.SerialException):
-                pass
+        ports = [entry.device for entry in self.discovery.scan() if entry.available is not False]
         
         if ports:
             self.port_combo.addItems(ports)
+            if current in ports:
+                self.port_combo.setCurrentText(current)
         else:
             self.port_combo.addItem("No ports found")
 
@@ -123,14 +106,14 @@ class ATCommandTool(QMainWindow):
         command = self.at_input.text().strip()
         
         if not port or port == "No ports found":
-            self.output.append("Error: No COM port selected")
+            self.output_sink.append("Error: No COM port selected")
             return
         
         if not command:
-            self.output.append("Error: No AT command entered")
+            self.output_sink.append("Error: No AT command entered")
             return
         
-        self.output.append(f"> {command}")
+        self.output_sink.append(f"> {command}")
         
         self.thread = SerialThread(port, command)
         self.thread.result_received.connect(self.show_result)
@@ -141,7 +124,13 @@ class ATCommandTool(QMainWindow):
         self.thread.finished.connect(lambda: self.send_btn.setEnabled(True))
 
     def show_result(self, result):
-        self.output.append(result)
+        self.output_sink.append(result)
+
+    def closeEvent(self, event):
+        self.hotplug.stop()
+        self.discovery.close()
+        close_all_transports()
+        event.accept()
 
 
 if __name__ == "__main__":
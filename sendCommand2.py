@@ -1,8 +1,11 @@
 import sys
-import serial
-import serial.tools.list_ports
+from port_discovery import PortDiscovery, HotplugWatcher
+from at_transport import get_transport, close_transport, close_all_transports
+from band_manager import get_band_manager, band_target
+from response_spool import execute_spooled
+from output_sink import QtOutputSink
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QTextEdit, QLineEdit, QLabel, 
+                             QPushButton, QPlainTextEdit, QLineEdit, QLabel, 
                              QComboBox, QWidget, QMessageBox)
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QFont
@@ -16,49 +19,41 @@ class SerialWorker(QThread):
         super().__init__()
         self.port = port
         self.command = command
-        self.serial_conn = None
 
     def run(self):
         try:
-            self.serial_conn = serial.Serial(
-                port=self.port,
-                baudrate=115200,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=1
-            )
-            
-            # Отправка команды
-            self.serial_conn.write((self.command + "\r\n").encode('utf-8'))
-            
-            # Чтение ответа
-            response = []
-            while True:
-                line = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                if not line:
-                    break
-                response.append(line)
-            
-            self.result_received.emit("\n".join(response))
+            target = band_target(self.command)
+            if target is not None:
+                # Диапазон пишется только если отличается от текущего
+                response = get_band_manager(self.port).apply(target).describe()
+            else:
+                # Соединение открывается один раз и переиспользуется
+                response = execute_spooled(get_transport(self.port), self.command)[1].text()
+            self.result_received.emit(response)
             
         except Exception as e:
+            close_transport(self.port)
             self.error_occurred.emit(str(e))
-        finally:
-            if self.serial_conn and self.serial_conn.is_open:
-                self.serial_conn.close()
 
 
 class ATCommandApp(QMainWindow):
+    ports_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AT Command Sender")
         self.setGeometry(100, 100, 600, 500)
         
         self.worker = None
+        self.discovery = PortDiscovery()
         self.init_ui()
         self.update_com_ports()
 
+        # Обновляем список при подключении/отключении устройств
+        self.ports_changed.connect(self.update_com_ports)
+        self.hotplug = HotplugWatcher(self.discovery, lambda added, removed: self.ports_changed.emit())
+        self.hotplug.start()
+
     def init_ui(self):
         main_widget = QWidget()
         layout = QVBoxLayout()
@@ -112,8 +107,9 @@ class ATCommandApp(QMainWindow):
         layout.addLayout(custom_layout)
 
         # Вывод результатов
-        self.result_output = QTextEdit()
+        self.result_output = QPlainTextEdit()
         self.result_output.setReadOnly(True)
+        self.output_sink = QtOutputSink(self.result_output)
         hack_font = QFont("Hack", 10)
         self.result_output.setFont(hack_font)
         layout.addWidget(self.result_output)
@@ -122,14 +118,19 @@ class ATCommandApp(QMainWindow):
         self.setCentralWidget(main_widget)
 
     def update_com_ports(self):
+        current = self.com_port_combo.currentData()
         self.com_port_combo.clear()
-        ports = serial.tools.list_ports.comports()
+        # Без пробного открытия: занятый порт тоже показываем
+        ports = self.discovery.scan(probe=False)
         if not ports:
             self.com_port_combo.addItem("No ports found")
             return
         
         for port in ports:
             self.com_port_combo.addItem(port.device, port.device)
+        index = self.com_port_combo.findData(current)
+        if index >= 0:
+            self.com_port_combo.setCurrentIndex(index)
 
     def send_command(self, command):
         if not command:
@@ -144,7 +145,7 @@ class ATCommandApp(QMainWindow):
             QMessageBox.warning(self, "Warning", "Please wait for the current command to finish")
             return
         
-        self.result_output.append(f"> {command}")
+        self.output_sink.append(f"> {command}")
         
         self.worker = SerialWorker(selected_port, command)
         self.worker.result_received.connect(self.display_result)
@@ -157,12 +158,20 @@ class ATCommandApp(QMainWindow):
             self.send_command(command)
 
     def display_result(self, result):
-        self.result_output.append(result)
-        self.result_output.append("")  # Пустая строка для разделения
+        self.output_sink.append(result)
+        self.output_sink.append("")  # Пустая строка для разделения
 
     def display_error(self, error):
-        self.result_output.append(f"Error: {error}")
-        self.result_output.append("")  # Пустая строка для разделения
+        self.output_sink.append(f"Error: {error}")
+        self.output_sink.append("")  # Пустая строка для разделения
+
+    def closeEvent(self, event):
+        self.hotplug.stop()
+        self.discovery.close()
+        if self.worker and self.worker.isRunning():
+            self.worker.wait()
+        close_all_transports()
+        event.accept()
 
 
 if __name__ == "__main__":
@@ -2,9 +2,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import serial
 import serial.tools.list_ports
-import threading
-import time
 import tkinter.font as tkFont
+import threading
+from at_transport import ATTransport, DEFAULT_BAUDRATE
+from serial_reader import TkDispatcher
+from output_sink import TkOutputSink
+from status_model import StatusModel, format_rtt, format_rate
+from port_roles import RoleCache
+from response_spool import execute_spooled
 
 class ATCommandSender:
     def __init__(self, master):
@@ -13,17 +18,21 @@ class ATCommandSender:
 
         self.port = tk.StringVar()
         self.at_command = tk.StringVar()
-        self.serial_connection = None
+        self.transport = None
+        self.urc_subscription = None
         self.is_connected = tk.BooleanVar(value=False)
-        self.baudrate = 115200
+        self.baudrate = DEFAULT_BAUDRATE
         self.timeout = 1.0
-        self.receive_thread = None
-        self.stop_reading = threading.Event()
-        self.last_command_sent = tk.StringVar(value="Нет")
+        self.dispatcher = TkDispatcher(master)
+        self.status = StatusModel()
+        self.status_redraw_pending = False
 
         self.create_widgets()
+        # Модель состояния следит за переменными Tk, строка состояния перерисовывается по изменению
+        self.port.trace_add("write", lambda *args: self.status.set(port=self.port.get()))
+        self.is_connected.trace_add("write", lambda *args: self.status.set(connected=self.is_connected.get()))
         self.update_com_ports()
-        self.update_status_bar() # Инициализируем строку состояния
+        self.status.subscribe(self.on_status_changed) # Инициализируем строку состояния
 
     def create_widgets(self):
         output_font = tkFont.Font(family="Hack", size=8)
@@ -63,6 +72,7 @@ class ATCommandSender:
         self.response_text_area = scrolledtext.ScrolledText(self.master, wrap=tk.WORD, height=10, font=output_font)
         self.response_text_area.grid(row=3, column=0, columnspan=4, padx=5, pady=5, sticky="nsew")
         self.response_text_area.config(state=tk.DISABLED) # Сделаем поле только для чтения
+        self.output_sink = TkOutputSink(self.response_text_area)
 
         # Кнопка очистки вывода
         clear_button = ttk.Button(self.master, text="Очистить вывод", command=self.clear_output)
@@ -83,12 +93,19 @@ class ATCommandSender:
         # Изначально делаем кнопки команд и "Отправить" неактивными
         self.disable_command_buttons()
 
+    def on_status_changed(self, model, changed):
+        if not self.status_redraw_pending:
+            self.status_redraw_pending = True
+            self.master.after_idle(self.update_status_bar)
+
     def update_status_bar(self):
-        port_status = f"Порт: {self.port.get() if self.port.get() else 'Не выбран'}"
-        connection_status = f"Соединение: {'Подключено' if self.is_connected.get() else 'Отключено'}"
-        last_command = f"Последняя команда: {self.last_command_sent.get()}"
-        self.status_bar.config(text=f"{port_status} | {connection_status} | {last_command}")
-        self.master.after(100, self.update_status_bar) # Обновляем статус каждые 100 мс
+        self.status_redraw_pending = False
+        status = self.status
+        port_status = f"Порт: {status.port if status.port else 'Не выбран'}"
+        connection_status = f"Соединение: {'Подключено' if status.connected else 'Отключено'}"
+        last_command = f"Последняя команда: {status.last_command or 'Нет'}"
+        link_status = f"RTT: {format_rtt(status.rtt)} | Скорость: {format_rate(status.throughput)}"
+        self.status_bar.config(text=f"{port_status} | {connection_status} | {last_command} | {link_status}")
 
     def disable_command_buttons(self):
         self.button1.config(state='disabled')
@@ -107,17 +124,15 @@ class ATCommandSender:
         self.send_button.config(state='normal')
 
     def display_system_message(self, message):
-        self.response_text_area.config(state=tk.NORMAL)
-        self.response_text_area.insert(tk.END, f"[Системное сообщение]: {message}\n")
-        self.response_text_area.config(state=tk.DISABLED)
-        self.response_text_area.see(tk.END)
+        self.output_sink.append(f"[Системное сообщение]: {message}")
 
     def update_com_ports(self):
         ports = serial.tools.list_ports.comports()
         port_names = [f"{port.device} ({port.description})" for port in ports]
         self.port_combo['values'] = port_names
-        default_port = "COM13"
-        if any(default_port in name for name in port_names):
+        # AT-порт, запомненный для этого модема по серийному номеру USB
+        default_port = RoleCache().find_at_port(ports)
+        if default_port:
             self.port.set(default_port)
         elif ports:
             self.port.set(ports[0].device)
@@ -154,7 +169,7 @@ class ATCommandSender:
             return
 
         try:
-            self.serial_connection = serial.Serial(selected_port, baud, timeout=time)
+            self.transport = ATTransport(selected_port, baud, time).open()
             self.connect_button.config(text="Отключиться", command=self.toggle_connection)
             self.is_connected.set(True)
             self.enable_command_buttons()
@@ -162,17 +177,17 @@ class ATCommandSender:
             self.start_receive_thread() # Запускаем поток для чтения данных
         except serial.SerialException as e:
             messagebox.showerror("Ошибка подключения", f"Не удалось подключиться к {selected_port}: {e}")
-            self.serial_connection = None
+            self.transport = None
             self.is_connected.set(False)
             self.disable_command_buttons()
 
     def disconnect_port(self):
         if self.is_connected.get():
             self.stop_receive_thread() # Останавливаем поток чтения
-            if self.serial_connection and self.serial_connection.is_open:
+            if self.transport and self.transport.is_open:
                 try:
-                    self.serial_connection.close()
-                    self.serial_connection = None
+                    self.transport.close()
+                    self.transport = None
                     self.connect_button.config(text="Подключиться", command=self.toggle_connection)
                     self.is_connected.set(False)
                     self.disable_command_buttons()
@@ -185,55 +200,61 @@ class ATCommandSender:
                 self.disable_command_buttons()
 
     def start_receive_thread(self):
-        self.stop_reading.clear()
-        self.receive_thread = threading.Thread(target=self.read_serial_data, daemon=True)
-        self.receive_thread.start()
+        # Порт читает только поток транспорта: ответы возвращает execute(), URC приходят подписчику,
+        # данные и ошибки передаются в главный поток Tk, виджеты трогает только он
+        self.transport.start_reader(on_error=lambda e: self.dispatcher.call_soon(self.on_read_error, e))
+        self.urc_subscription = self.transport.subscribe(
+            callback=lambda line: self.dispatcher.call_soon(self.display_received_data, line))
 
     def stop_receive_thread(self):
-        self.stop_reading.set()
-        if self.receive_thread and self.receive_thread.is_alive():
-            self.receive_thread.join(timeout=1.0) # Даем потоку время на завершение
+        if self.urc_subscription:
+            self.urc_subscription.close()
+            self.urc_subscription = None
+        if self.transport:
+            self.transport.stop_reader()
 
-    def read_serial_data(self):
-        if self.serial_connection:
-            while not self.stop_reading.is_set() and self.serial_connection.is_open:
-                try:
-                    if self.serial_connection.in_waiting > 0:
-                        data = self.serial_connection.read(self.serial_connection.in_waiting)
-                        decoded_data = data.decode(errors='ignore')
-                        self.display_received_data(decoded_data)
-                    time.sleep(0.1) # Небольшая задержка, чтобы не загружать процессор
-                except serial.SerialException as e:
-                    self.display_system_message(f"Ошибка при чтении данных с порта: {e}")
-                    self.disconnect_port()
-                    break
-                except Exception as e:
-                    self.display_system_message(f"Неожиданная ошибка в потоке чтения: {e}")
-                    self.disconnect_port()
-                    break
+    def on_read_error(self, e):
+        self.display_system_message(f"Ошибка при чтении данных с порта: {e}")
+        self.disconnect_port()
 
     def display_received_data(self, data):
-        self.response_text_area.config(state=tk.NORMAL)
-        self.response_text_area.insert(tk.END, f"[Получено]: {data}")
-        self.response_text_area.config(state=tk.DISABLED)
-        self.response_text_area.see(tk.END)
+        self.output_sink.append(f"[Получено]: {data}")
 
     def _send_command(self, command):
-        if self.serial_connection and self.serial_connection.is_open:
-            try:
-                self.serial_connection.write(f"{command}\r\n".encode())
-                self.last_command_sent.set(command) # Обновляем последнюю отправленную команду
-                response = self.serial_connection.read(1024).decode(errors='ignore').strip()
-                self.display_response(response)
-            except serial.SerialException as e:
-                messagebox.showerror("Ошибка записи/чтения", f"Ошибка при отправке/получении данных: {e}")
-                self.disconnect_port()
+        if self.transport and self.transport.is_open:
+            self.status.command_sent(command) # Обновляем последнюю отправленную команду
+            # Ожидание финального кода идёт в рабочем потоке, окно не блокируется
+            threading.Thread(target=self._execute, args=(self.transport, command), daemon=True).start()
         else:
             messagebox.showerror("Ошибка", "Порт не подключен.")
-        self.update_status_bar() # Обновляем строку состояния после отправки команды
+
+    def _execute(self, transport, command):
+        try:
+            spool = execute_spooled(transport, command)[1]
+        except serial.SerialException as e:
+            self.dispatcher.call_soon(self.on_command_error, e)
+            return
+        except Exception as e:
+            # Ошибка не порта (например, записи во временный файл): порт остаётся открытым
+            self.dispatcher.call_soon(self.on_command_failed, command, e)
+            return
+        self.dispatcher.call_soon(self.on_response, spool)
+
+    def on_response(self, spool):
+        self.status.data_received(spool.size + spool.count)
+        self.status.command_finished()
+        self.display_response(spool.text())
+
+    def on_command_error(self, e):
+        messagebox.showerror("Ошибка записи/чтения", f"Ошибка при отправке/получении данных: {e}")
+        self.disconnect_port()
+
+    def on_command_failed(self, command, e):
+        self.status.command_finished()
+        messagebox.showerror("Ошибка", f"Команда {command} не выполнена: {e}")
 
     def send_at_command(self):
-        if not self.is_connected.get() or not self.serial_connection or not self.serial_connection.is_open:
+        if not self.is_connected.get() or not self.transport or not self.transport.is_open:
             messagebox.showerror("Ошибка", "Порт не подключен.")
             return
 
@@ -245,50 +266,45 @@ class ATCommandSender:
         self._send_command(command)
 
     def send_command_1(self):
-        if not self.is_connected.get() or not self.serial_connection or not self.serial_connection.is_open:
+        if not self.is_connected.get() or not self.transport or not self.transport.is_open:
             messagebox.showerror("Ошибка", "Порт не подключен.")
             return
         command = "ATI"
         self._send_command(command)
 
     def send_command_2(self):
-        if not self.is_connected.get() or not self.serial_connection or not self.serial_connection.is_open:
+        if not self.is_connected.get() or not self.transport or not self.transport.is_open:
             messagebox.showerror("Ошибка", "Порт не подключен.")
             return
         command = "" # Добавьте свою команду здесь
         self._send_command(command)
 
     def send_command_3(self):
-        if not self.is_connected.get() or not self.serial_connection or not self.serial_connection.is_open:
+        if not self.is_connected.get() or not self.transport or not self.transport.is_open:
             messagebox.showerror("Ошибка", "Порт не подключен.")
             return
         command = "" # Добавьте свою команду здесь
         self._send_command(command)
 
     def send_command_4(self):
-        if not self.is_connected.get() or not self.serial_connection or not self.serial_connection.is_open:
+        if not self.is_connected.get() or not self.transport or not self.transport.is_open:
             messagebox.showerror("Ошибка", "Порт не подключен.")
             return
         command = "" # Добавьте свою команду здесь
         self._send_command(command)
 
     def send_command_5(self):
-        if not self.is_connected.get() or not self.serial_connection or not self.serial_connection.is_open:
+        if not self.is_connected.get() or not self.transport or not self.transport.is_open:
             messagebox.showerror("Ошибка", "Порт не подключен.")
             return
         command = "" # Добавьте свою команду здесь
         self._send_command(command)
 
     def display_response(self, response):
-        self.response_text_area.config(state=tk.NORMAL)
-        self.response_text_area.insert(tk.END, f"[Ответ]: {response}\n")
-        self.response_text_area.config(state=tk.DISABLED)
-        self.response_text_area.see(tk.END)
+        self.output_sink.append(f"[Ответ]: {response}")
 
     def clear_output(self):
-        self.response_text_area.config(state=tk.NORMAL)
-        self.response_text_area.delete("1.0", tk.END)
-        self.response_text_area.config(state=tk.DISABLED)
+        self.output_sink.clear()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,87 @@
+# serial_reader.py
+import queue
+import threading
+from line_framer import LineFramer
+
+
+class SerialReader(threading.Thread):
+    """Background thread that blocks on the port and hands over data as soon as it arrives"""
+
+    def __init__(self, serial_conn, on_data=None, on_line=None, on_error=None, capture=None):
+        super().__init__(daemon=True, name=f"reader-{serial_conn.port}")
+        self.serial_conn = serial_conn
+        self.on_data = on_data
+        self.on_line = on_line
+        self.on_error = on_error
+        self.capture = capture
+        self.stop_event = threading.Event()
+        self.framer = LineFramer()
+
+    def run(self):
+        conn = self.serial_conn
+        while not self.stop_event.is_set():
+            try:
+                # read() спит в select/WaitForSingleObject до прихода байта
+                data = conn.read(max(1, conn.in_waiting))
+            except Exception as e:
+                if not self.stop_event.is_set() and self.on_error:
+                    self.on_error(e)
+                break
+            if data:
+                if self.capture is not None:
+                    self.capture.rx(data)
+                self._deliver(data)
+
+    def _deliver(self, data):
+        if self.on_data:
+            self.on_data(data)
+        if self.on_line:
+            self.framer.feed(data)
+            for line in self.framer.lines():
+                self.on_line(line)
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        try:
+            # Будим поток, заблокированный в read()
+            self.serial_conn.cancel_read()
+        except Exception:
+            pass
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+class TkDispatcher:
+    """Runs callbacks from worker threads on the Tk main loop"""
+
+    EVENT = "<<SerialDispatch>>"
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        widget.bind(self.EVENT, self._drain)
+
+    def call_soon(self, func, *args):
+        self.queue.put((func, args))
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        try:
+            # event_generate из чужого потока tkinter передаёт в главный поток
+            self.widget.event_generate(self.EVENT, when="tail")
+        except RuntimeError:
+            # Главный цикл уже остановлен
+            pass
+
+    def _drain(self, event=None):
+        with self.lock:
+            self.scheduled = False
+        while True:
+            try:
+                func, args = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
@@ -0,0 +1,389 @@
+# session_replay.py
+import argparse
+import cProfile
+import os
+import pstats
+import queue
+import sys
+import threading
+import time
+from at_transport import ATTransport, DEFAULT_BAUDRATE
+from modem_console import ModemConsole
+from output_sink import DEFAULT_MAX_LINES, FRAME_INTERVAL_MS, OutputSink
+from serial_reader import SerialReader
+from status_model import StatusModel
+from traffic_capture import TX, TrafficCapture, capture_files, capture_prefixes, read_capture
+
+GUI_APPS = ("ModemSetup2", "sendCommandTest")
+
+
+def load_records(paths, port=None):
+    """Records of capture files or directories of them, ordered by time
+
+    A directory may hold captures of several ports; only one port's files are taken from it,
+    so port is required when there is more than one.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+        elif port is not None:
+            files.extend(capture_files(path, port))
+        else:
+            prefixes = capture_prefixes(path)
+            if len(prefixes) > 1:
+                raise ValueError(f"{path} holds captures of several ports ({', '.join(sorted(prefixes))}), "
+                                 f"choose one with --port")
+            files.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".cap.gz"))
+    records = []
+    for path in files:
+        records.extend(read_capture(path))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+class ReplaySerial:
+    """Serial-port stand-in that plays recorded RX traffic back to a reader
+
+    speed 1.0 keeps the recorded timing, 2.0 plays twice as fast, 0 plays as fast as possible.
+    """
+
+    def __init__(self, records, speed=1.0, on_tx=None, port="replay", eof_error=False):
+        self.records = records
+        self.speed = speed
+        self.on_tx = on_tx
+        self.port = port
+        # Без EOF-ошибки порт после конца записи молчит, как простаивающий модем
+        self.eof_error = eof_error
+        self.timeout = None
+        self.is_open = True
+        self.buffer = bytearray()
+        self.condition = threading.Condition()
+        self.cancelled = False
+        self.finished = threading.Event()
+        self.stop_event = threading.Event()
+        self.bytes_written = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._feed, daemon=True, name="replay-feeder")
+        self.thread.start()
+        return self
+
+    def _feed(self):
+        try:
+            if not self.records:
+                return
+            first = self.records[0][0]
+            started = time.monotonic()
+            for timestamp, direction, data in self.records:
+                if self.speed > 0:
+                    delay = started + (timestamp - first) / self.speed - time.monotonic()
+                    if delay > 0 and self.stop_event.wait(delay):
+                        return
+                elif self.stop_event.is_set():
+                    return
+                if direction == TX:
+                    if self.on_tx:
+                        self.on_tx(data)
+                    continue
+                with self.condition:
+                    self.buffer += data
+                    self.condition.notify()
+        finally:
+            with self.condition:
+                self.finished.set()
+                self.condition.notify_all()
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def read(self, size=1):
+        with self.condition:
+            while not self.buffer and not self.cancelled and self.is_open:
+                if self.eof_error and self.finished.is_set():
+                    raise EOFError("end of recording")
+                self.condition.wait()
+            self.cancelled = False
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            return data
+
+    def write(self, data):
+        # Команды, отправленные во время воспроизведения, никуда не уходят
+        self.bytes_written += len(data)
+        return len(data)
+
+    def cancel_read(self):
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+
+    def close(self):
+        self.stop_event.set()
+        with self.condition:
+            self.is_open = False
+            self.condition.notify_all()
+
+
+class NullOutputSink(OutputSink):
+    """Output sink without a widget, flushed once per frame by the replay loop"""
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, frame_ms=FRAME_INTERVAL_MS):
+        super().__init__(max_lines, frame_ms)
+        self.rendered_chars = 0
+        self.frames = 0
+        self.last_flush = time.monotonic()
+
+    def tick(self):
+        now = time.monotonic()
+        if now - self.last_flush >= self.frame_ms / 1000:
+            self.last_flush = now
+            self.flush()
+
+    def _schedule(self):
+        pass
+
+    def _render(self, text):
+        self.rendered_chars += len(text)
+        self.frames += 1
+
+    def _clear(self):
+        pass
+
+
+class HeadlessDispatcher:
+    """TkDispatcher stand-in: callbacks are queued here and run by HeadlessSession.run() as the Tk main loop would"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+
+    def call_soon(self, func, *args):
+        self.queue.put((func, args))
+
+
+class HeadlessSession:
+    """ModemSetup2's own receive code without a window
+
+    The recording goes through ATTransport's reader and response/URC demux, and every line
+    through the ModemConsole that ModemSetup2 uses, into an output sink. Only the Tk parts
+    are replaced: TkDispatcher (by HeadlessDispatcher) and the Text widget behind TkOutputSink
+    (by NullOutputSink), so widget insert and redraw costs are not measured. Recorded commands
+    are not executed again, so their replies take the unsolicited-line path, not execute_spooled().
+    """
+
+    def __init__(self, records, speed=0.0):
+        self.sink = NullOutputSink()
+        self.dispatcher = HeadlessDispatcher()
+        self.serial_conn = ReplaySerial(records, speed, on_tx=self.on_tx, eof_error=True)
+        self.transport = ATTransport("replay", capture=False)
+        self.transport.serial_conn = self.serial_conn
+        self.console = ModemConsole(self.dispatcher, self.sink, StatusModel(port="replay", connected=True))
+        self.error = None
+        self.finished = False
+        self.lines = 0
+        self.commands = 0
+
+    def on_tx(self, data):
+        # Как ATCommandSender._send_command: команда в выводе и отсчёт времени ответа
+        for command in data.decode('ascii', errors='ignore').split("\r"):
+            command = command.strip()
+            if command:
+                self.commands += 1
+                self.dispatcher.call_soon(self.console.command_sent, command)
+
+    def start_reader(self):
+        self.console.start_reader(self.transport, self.on_read_error)
+
+    def on_read_error(self, e):
+        # Вместо отключения через виджеты: конец записи завершает воспроизведение
+        if not isinstance(e, EOFError):
+            self.error = e
+        # Строки идут к подписчику через поток доставки транспорта: метка в его очереди приходит после них
+        self.transport.dispatch_queue.put((lambda line: self.dispatcher.call_soon(self.finish), None))
+
+    def finish(self):
+        self.finished = True
+
+    def run(self):
+        """Run dispatched callbacks and flush the sink once per frame until the reader stops"""
+        timeout = self.sink.frame_ms / 1000
+        while not self.finished:
+            try:
+                func, args = self.dispatcher.queue.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                if func == self.console.read_data:
+                    self.lines += 1
+                func(*args)
+            self.sink.tick()
+        self.sink.flush()
+
+    def close(self):
+        self.console.stop_reader(self.transport)
+        self.serial_conn.close()
+
+
+def _profile_new_thread(profile):
+    """threading.setprofile() hook that enables profile in the thread it first runs in"""
+    def hook(frame, event, arg):
+        sys.setprofile(None)
+        profile.enable()
+    return hook
+
+
+def replay_headless(records, speed=0.0, profiles=None):
+    """Replay through ModemSetup2's receive code without a window, returns stats
+
+    profiles is a pair of cProfile.Profile: the first covers the calling thread (ModemConsole
+    and the sink), the second the transport's reader thread (framing and response/URC demux).
+    """
+    session = HeadlessSession(records, speed)
+    started = time.perf_counter()
+    try:
+        if profiles is not None:
+            # cProfile видит только свой поток, поток чтения профилируется отдельно
+            threading.setprofile(_profile_new_thread(profiles[1]))
+            try:
+                session.start_reader()
+            finally:
+                threading.setprofile(None)
+            profiles[0].enable()
+        else:
+            session.start_reader()
+        session.serial_conn.start()
+        try:
+            session.run()
+        finally:
+            if profiles is not None:
+                profiles[0].disable()
+    finally:
+        session.close()
+    if session.error is not None:
+        raise session.error
+    elapsed = time.perf_counter() - started
+    recorded = records[-1][0] - records[0][0] if records else 0.0
+    return {
+        "records": len(records),
+        "bytes": sum(len(data) for _, direction, data in records if direction != TX),
+        "lines": session.lines,
+        "commands": session.commands,
+        "frames": session.sink.frames,
+        "recorded_s": round(recorded, 3),
+        "elapsed_s": round(elapsed, 3),
+        "speedup": round(recorded / elapsed, 1) if elapsed else None,
+    }
+
+
+def replay_gui(records, app_name, speed=1.0):
+    """Open a front-end window and feed the recording into its transport reader"""
+    import tkinter as tk
+    root = tk.Tk()
+    transport = ATTransport("replay", capture=False)
+    if app_name == "ModemSetup2":
+        from ModemSetup2 import ATCommandSender
+        app = ATCommandSender(root)
+        on_tx = lambda data: app.dispatcher.call_soon(app.status.command_sent, data.decode(errors='ignore').strip())
+        transport.serial_conn = ReplaySerial(records, speed, on_tx=on_tx)
+        app.transport = transport
+        app.start_reader()
+        app.status.set(port="replay", connected=True)
+        stop = app.stop_reader
+    else:
+        from sendCommandTest import ATCommandSender
+        app = ATCommandSender(root)
+        transport.serial_conn = ReplaySerial(records, speed)
+        app.transport = transport
+        app.port.set("replay")
+        app.is_connected.set(True)
+        app.start_receive_thread()
+        stop = app.stop_receive_thread
+
+    def on_closing():
+        stop()
+        transport.serial_conn.close()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    # Без отправленных приложением команд весь записанный поток идёт подписчикам и в вывод
+    transport.serial_conn.start()
+    root.mainloop()
+
+
+def record_session(port, directory, baudrate=DEFAULT_BAUDRATE, commands=(), duration=None):
+    """Capture a port's traffic, optionally sending commands first, until the duration or Ctrl+C"""
+    capture = TrafficCapture(directory, port).start()
+    try:
+        with ATTransport(port, baudrate, capture=capture) as transport:
+            reader = SerialReader(transport.serial_conn, capture=capture)
+            reader.start()
+            try:
+                for command in commands:
+                    transport.write_command(command)
+                    time.sleep(0.5)
+                deadline = time.monotonic() + duration if duration else None
+                while reader.is_alive() and (deadline is None or time.monotonic() < deadline):
+                    reader.join(0.5)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                reader.stop()
+    finally:
+        capture.close()
+    return capture.records
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Record serial sessions and replay them through the receive path")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    record = sub.add_parser("record", help="capture a port's raw traffic")
+    record.add_argument("-p", "--port", required=True)
+    record.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE)
+    record.add_argument("-d", "--dir", default="captures", help="capture directory")
+    record.add_argument("-c", "--command", action="append", default=[], help="command to send after opening")
+    record.add_argument("--duration", type=float, help="seconds to record, default until Ctrl+C")
+
+    replay = sub.add_parser("replay", help="feed a recording back through the receive path")
+    replay.add_argument("paths", nargs="+", help="capture files or directories")
+    replay.add_argument("-p", "--port", help="port whose captures to take from directories")
+    replay.add_argument("--speed", type=float, default=0.0,
+                        help="1 = recorded timing, 0 = as fast as possible (default)")
+    replay.add_argument("--gui", choices=GUI_APPS, help="replay into a front-end window instead of headless")
+    replay.add_argument("--profile", type=int, nargs="?", const=25, metavar="N",
+                        help="profile the headless replay and print the top N functions")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "record":
+        records = record_session(args.port, args.dir, args.baudrate, args.command, args.duration)
+        print(f"Records captured: {records}", file=sys.stderr)
+        return 0
+
+    try:
+        records = load_records(args.paths, args.port)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.gui:
+        if getattr(sys, "frozen", False):
+            # Собранная консольная утилита идёт без tkinter, воспроизведение без окна работает и в ней
+            print("Error: this build has no GUI, replay without --gui or run session_replay from source",
+                  file=sys.stderr)
+            return 2
+        replay_gui(records, args.gui, args.speed)
+        return 0
+    profiles = (cProfile.Profile(), cProfile.Profile()) if args.profile else None
+    stats = replay_headless(records, args.speed, profiles)
+    for key, value in stats.items():
+        print(f"{key:<12} {value}")
+    if profiles is not None:
+        pstats.Stats(*profiles, stream=sys.stderr).sort_stats("cumulative").print_stats(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# status_model.py
+import time
+
+
+def format_rtt(rtt):
+    if rtt is None:
+        return "-"
+    return f"{rtt * 1000:.0f} мс"
+
+
+def format_rate(bytes_per_second):
+    if bytes_per_second is None:
+        return "-"
+    if bytes_per_second >= 1024:
+        return f"{bytes_per_second / 1024:.1f} КБ/с"
+    return f"{bytes_per_second:.0f} Б/с"
+
+
+class StatusModel:
+    """Observable connection status, listeners run only when a field actually changes"""
+
+    def __init__(self, port=None, connected=False, last_command=None):
+        self.port = port
+        self.connected = connected
+        self.last_command = last_command
+        # Время от отправки команды до финального кода и скорость приёма ответа
+        self.rtt = None
+        self.throughput = None
+        self.listeners = []
+        self._sent_at = None
+        self._received = 0
+
+    def subscribe(self, listener):
+        """Register listener(model, changed_fields) and call it once with the current state"""
+        self.listeners.append(listener)
+        listener(self, ())
+
+    def set(self, **changes):
+        changed = []
+        for name, value in changes.items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed.append(name)
+        if changed:
+            for listener in self.listeners:
+                listener(self, tuple(changed))
+
+    def command_sent(self, command):
+        self._sent_at = time.monotonic()
+        self._received = 0
+        self.set(last_command=command)
+
+    def data_received(self, nbytes):
+        if self._sent_at is not None:
+            self._received += nbytes
+
+    def command_finished(self):
+        if self._sent_at is None:
+            return
+        rtt = time.monotonic() - self._sent_at
+        self._sent_at = None
+        self.set(rtt=rtt, throughput=self._received / rtt if rtt > 0 else None)
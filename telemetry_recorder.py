@@ -0,0 +1,282 @@
+# telemetry_recorder.py
+import argparse
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from at_parsers import GStatusParser
+from at_transport import ATTransport, DEFAULT_BAUDRATE
+from at_metrics import start_http_server
+from command_scheduler import CommandCancelled, TELEMETRY
+
+# Метрики хранятся как int16 с масштабом 10 (0.1 дБ), пропуск - MISSING
+METRICS = {
+    "rsrp": lambda status: status.rsrp,
+    "rsrq": lambda status: status.rsrq,
+    "sinr": lambda status: status.sinr,
+    "rssi": lambda status: status.rssi_rxm,
+    "temperature": lambda status: status.temperature,
+    "tx_power": lambda status: status.tx_power,
+}
+SCALE = 10
+MISSING = -32768
+ROLLUP_EVERY = 60
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DIR = "telemetry"
+
+
+def _encode(value):
+    if value is None:
+        return MISSING
+    return max(-32767, min(32767, int(round(value * SCALE))))
+
+
+def _decode(raw):
+    return None if raw == MISSING else raw / SCALE
+
+
+@contextmanager
+def _mapped_array(path, typecode):
+    """Read-only view of a column file, empty if the file does not exist yet; unmapped on exit"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if size == 0:
+        yield memoryview(b"").cast(typecode)
+        return
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    itemsize = array(typecode).itemsize
+    try:
+        with memoryview(mapped) as view:
+            # Хвост недописанной записи отбрасываем
+            with view[:size - size % itemsize] as whole, whole.cast(typecode) as values:
+                yield values
+    finally:
+        mapped.close()
+
+
+def _truncate(path, size):
+    try:
+        if os.path.getsize(path) > size:
+            os.truncate(path, size)
+    except OSError:
+        pass
+
+
+class ColumnStore:
+    """Append-only fixed-width columns, one file per metric, for a single modem"""
+
+    def __init__(self, path, metrics=tuple(METRICS), rollup_every=ROLLUP_EVERY):
+        self.path = path
+        self.metrics = tuple(metrics)
+        self.rollup_every = rollup_every
+        self.lock = threading.Lock()
+        self.files = {}
+        self.block_ts = None
+        self.block = {metric: array("h") for metric in self.metrics}
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _repair(self):
+        """Cut off a row torn by a crash: metric columns longer than the timestamp column"""
+        rows = os.path.getsize(self._file("ts.u32")) // 4 if os.path.exists(self._file("ts.u32")) else 0
+        _truncate(self._file("ts.u32"), rows * 4)
+        blocks = os.path.getsize(self._file("rollup_ts.u32")) // 4 \
+            if os.path.exists(self._file("rollup_ts.u32")) else 0
+        _truncate(self._file("rollup_ts.u32"), blocks * 4)
+        for metric in self.metrics:
+            _truncate(self._file(f"{metric}.i16"), rows * 2)
+            _truncate(self._file(f"{metric}.rollup.i16"), blocks * 3 * 2)
+
+    def _write(self, name, typecode, values):
+        f = self.files.get(name)
+        if f is None:
+            if not self.files:
+                # Каталог и починка - только у записывающего, запрос ничего не меняет
+                os.makedirs(self.path, exist_ok=True)
+                self._repair()
+            f = self.files[name] = open(self._file(name), 'ab')
+        array(typecode, values).tofile(f)
+        f.flush()
+
+    def close(self):
+        with self.lock:
+            self.flush_rollup()
+            for f in self.files.values():
+                f.close()
+            self.files.clear()
+
+    def append(self, timestamp, values):
+        """Append one sample; values maps metric name to a float or None"""
+        encoded = {metric: _encode(values.get(metric)) for metric in self.metrics}
+        with self.lock:
+            for metric, raw in encoded.items():
+                self._write(f"{metric}.i16", "h", [raw])
+            # Время пишется последним: строка видна читателю только целиком,
+            # а оборванную при сбое строку _repair() отрезает при следующей записи
+            self._write("ts.u32", "I", [int(timestamp)])
+            self._add_to_rollup(int(timestamp), encoded)
+
+    def _add_to_rollup(self, timestamp, encoded):
+        if self.block_ts is None:
+            self.block_ts = timestamp
+        for metric, raw in encoded.items():
+            self.block[metric].append(raw)
+        if len(self.block[self.metrics[0]]) >= self.rollup_every:
+            self.flush_rollup()
+
+    def flush_rollup(self):
+        """Write min/avg/max of the samples collected since the last rollup"""
+        if self.block_ts is None:
+            return
+        for metric in self.metrics:
+            samples = [raw for raw in self.block[metric] if raw != MISSING]
+            if samples:
+                row = [min(samples), int(round(sum(samples) / len(samples))), max(samples)]
+            else:
+                row = [MISSING] * 3
+            self._write(f"{metric}.rollup.i16", "h", row)
+            self.block[metric] = array("h")
+        self._write("rollup_ts.u32", "I", [self.block_ts])
+        self.block_ts = None
+
+    def query(self, metric, start=0, end=2 ** 32 - 1):
+        """Samples of a metric with start <= timestamp <= end as (timestamps, values)"""
+        with _mapped_array(self._file("ts.u32"), "I") as timestamps, \
+                _mapped_array(self._file(f"{metric}.i16"), "h") as values:
+            count = min(len(timestamps), len(values))
+            lo = bisect_left(timestamps, start, 0, count)
+            hi = bisect_right(timestamps, end, lo, count)
+            return timestamps[lo:hi].tolist(), [_decode(raw) for raw in values[lo:hi].tolist()]
+
+    def rollups(self, metric, start=0, end=2 ** 32 - 1):
+        """Rollup blocks as (block_start, min, avg, max) tuples"""
+        with _mapped_array(self._file("rollup_ts.u32"), "I") as timestamps, \
+                _mapped_array(self._file(f"{metric}.rollup.i16"), "h") as values:
+            count = min(len(timestamps), len(values) // 3)
+            lo = bisect_left(timestamps, start, 0, count)
+            hi = bisect_right(timestamps, end, lo, count)
+            return [(timestamps[i], _decode(values[i * 3]), _decode(values[i * 3 + 1]),
+                     _decode(values[i * 3 + 2])) for i in range(lo, hi)]
+
+
+def modem_store_path(root, port):
+    # COM5 или /dev/ttyUSB2 -> безопасное имя каталога
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "_", port.strip("/")))
+
+
+class TelemetryPoller(threading.Thread):
+    """Samples AT!GSTATUS? at a fixed interval into a ColumnStore
+
+    With a CommandScheduler the polls run at telemetry priority behind any interactive
+    command, and a poll that cannot start within one interval is skipped.
+    """
+
+    def __init__(self, transport, store, interval=DEFAULT_INTERVAL, command_timeout=5.0, scheduler=None):
+        super().__init__(daemon=True, name=f"telemetry-{transport.port}")
+        self.transport = transport
+        self.store = store
+        self.interval = interval
+        self.command_timeout = command_timeout
+        self.scheduler = scheduler
+        self.stop_event = threading.Event()
+        self.samples = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def _poll(self):
+        if self.scheduler is None:
+            return self.transport.execute("AT!GSTATUS?", self.command_timeout)
+        try:
+            return self.scheduler.execute("AT!GSTATUS?", self.command_timeout, priority=TELEMETRY,
+                                          deadline=self.interval, key="telemetry")
+        except CommandCancelled:
+            # Порт занят более важными командами - этот отсчёт пропускаем
+            self.skipped += 1
+            return None
+
+    def sample(self):
+        response = self._poll()
+        if response is None:
+            return None
+        if not response.ok:
+            self.errors += 1
+            return None
+        status = GStatusParser().feed_lines(response.lines)
+        self.store.append(time.time(), {metric: read(status) for metric, read in METRICS.items()})
+        self.samples += 1
+        return status
+
+    def run(self):
+        next_tick = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                self.sample()
+            except Exception:
+                self.errors += 1
+            # Расписание от монотонных часов не уплывает из-за длительности запроса
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            self.stop_event.wait(delay)
+        self.store.close()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Record or query modem signal telemetry")
+    parser.add_argument("-p", "--port", required=True)
+    parser.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE)
+    parser.add_argument("-d", "--dir", default=DEFAULT_DIR, help="telemetry root directory")
+    parser.add_argument("-i", "--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between samples")
+    parser.add_argument("--query", metavar="METRIC", help="print stored samples instead of recording")
+    parser.add_argument("--since", type=float, default=0, help="query start, seconds ago")
+    parser.add_argument("--rollups", action="store_true", help="query min/avg/max blocks")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on localhost:PORT")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = ColumnStore(modem_store_path(args.dir, args.port))
+
+    if args.query:
+        start = time.time() - args.since if args.since else 0
+        if args.rollups:
+            for ts, low, avg, high in store.rollups(args.query, start):
+                print(f"{ts}\t{low}\t{avg}\t{high}")
+        else:
+            for ts, value in zip(*store.query(args.query, start)):
+                print(f"{ts}\t{value}")
+        return 0
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    with ATTransport(args.port, args.baudrate) as transport:
+        poller = TelemetryPoller(transport, store, args.interval)
+        poller.start()
+        try:
+            while poller.is_alive():
+                poller.join(1.0)
+        except KeyboardInterrupt:
+            poller.stop()
+    print(f"Samples: {poller.samples}, errors: {poller.errors}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# traffic_capture.py
+import argparse
+import atexit
+import glob
+import gzip
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+
+# Заголовок файла: магия, время открытия по часам и по монотонным часам, имя порта
+MAGIC = b"MSCAP1\n"
+FILE_HEADER = struct.Struct("<dQH")
+# Запись: монотонное время в нс, направление, длина данных
+RECORD = struct.Struct("<QBI")
+RX = 0
+TX = 1
+DIRECTION_TAGS = {RX: "<", TX: ">"}
+
+CAPTURE_ENV = "MODEMSETUP_CAPTURE_DIR"
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_FILES = 10
+# Как часто сбрасывать сжатый поток на диск, секунды
+SYNC_INTERVAL = 5.0
+BATCH_TIMEOUT = 0.25
+MAX_BATCH = 64 * 1024
+
+
+def capture_prefix(port):
+    # COM5 или /dev/ttyUSB2 -> безопасное имя файла
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", port.strip("/"))
+
+
+class TrafficCapture:
+    """Records raw port traffic from any thread; compression and disk I/O happen on a writer thread"""
+
+    def __init__(self, directory, port, max_bytes=DEFAULT_MAX_BYTES, max_files=DEFAULT_MAX_FILES,
+                 compresslevel=6):
+        self.directory = directory
+        self.port = port
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.compresslevel = compresslevel
+        self.queue = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        self.file = None
+        self.file_bytes = 0
+        self.sequence = 0
+        self.records = 0
+        self.thread = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"capture-{self.port}")
+        self.thread.start()
+        return self
+
+    def record(self, direction, data):
+        """Queue a chunk of traffic, never blocks on disk"""
+        if data:
+            self.queue.put((time.monotonic_ns(), direction, bytes(data)))
+
+    def rx(self, data):
+        self.record(RX, data)
+
+    def tx(self, data):
+        self.record(TX, data)
+
+    def close(self, timeout=5.0):
+        self.stop_event.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=BATCH_TIMEOUT)
+                except queue.Empty:
+                    item = None
+                batch = bytearray()
+                # Всё, что накопилось, пишется одним вызовом
+                while item is not None:
+                    timestamp, direction, data = item
+                    batch += RECORD.pack(timestamp, direction, len(data))
+                    batch += data
+                    self.records += 1
+                    if len(batch) >= MAX_BATCH:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write(batch)
+                if self.file is not None and time.monotonic() - last_sync >= SYNC_INTERVAL:
+                    self.file.flush()
+                    last_sync = time.monotonic()
+                if self.stop_event.is_set() and self.queue.empty():
+                    break
+        finally:
+            self._close_file()
+
+    def _write(self, batch):
+        if self.file is None or self.file_bytes >= self.max_bytes:
+            self._rotate()
+        self.file.write(batch)
+        self.file_bytes += len(batch)
+
+    def _rotate(self):
+        self._close_file()
+        self.sequence += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{capture_prefix(self.port)}-{stamp}-{self.sequence:03d}.cap.gz")
+        self.file = gzip.open(path, 'wb', compresslevel=self.compresslevel)
+        name = self.port.encode('utf-8')
+        self.file.write(MAGIC + FILE_HEADER.pack(time.time(), time.monotonic_ns(), len(name)) + name)
+        self.file_bytes = 0
+        self._prune()
+
+    def _prune(self):
+        files = capture_files(self.directory, self.port)
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def capture_files(directory, port):
+    """Capture files of a port, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, f"{capture_prefix(port)}-*.cap.gz")), key=os.path.getmtime)
+
+
+def capture_prefixes(directory):
+    """File-name prefixes of the ports that have captures in a directory"""
+    # Имя файла: <префикс порта>-<дата>-<время>-<номер>.cap.gz
+    return {name.rsplit("-", 3)[0] for name in os.listdir(directory) if name.endswith(".cap.gz")}
+
+
+def _read_exact(f, size):
+    """Exactly size bytes, or None where a truncated or damaged file ends"""
+    try:
+        data = f.read(size)
+    except (EOFError, gzip.BadGzipFile, zlib.error):
+        return None
+    return data if len(data) == size else None
+
+
+def read_capture(path):
+    """Yield (wall_time, direction, data) records of a capture file
+
+    A file that was not closed properly (a crashed recorder, a rotation in progress)
+    ends cleanly at its last complete record.
+    """
+    with gzip.open(path, 'rb') as f:
+        magic = _read_exact(f, len(MAGIC))
+        if magic is None:
+            return
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a capture file")
+        header = _read_exact(f, FILE_HEADER.size)
+        if header is None:
+            return
+        wall_start, mono_start, name_len = FILE_HEADER.unpack(header)
+        if _read_exact(f, name_len) is None:
+            return
+        while True:
+            header = _read_exact(f, RECORD.size)
+            if header is None:
+                return
+            timestamp, direction, length = RECORD.unpack(header)
+            data = _read_exact(f, length)
+            if data is None:
+                return
+            yield wall_start + (timestamp - mono_start) / 1e9, direction, data
+
+
+_captures = {}
+_captures_lock = threading.Lock()
+
+
+def capture_for(port):
+    """Shared capture of a port if MODEMSETUP_CAPTURE_DIR is set, otherwise None"""
+    directory = os.environ.get(CAPTURE_ENV)
+    if not directory:
+        return None
+    with _captures_lock:
+        capture = _captures.get(port)
+        if capture is None:
+            capture = _captures[port] = TrafficCapture(directory, port).start()
+        return capture
+
+
+@atexit.register
+def close_all_captures():
+    with _captures_lock:
+        captures = list(_captures.values())
+        _captures.clear()
+    for capture in captures:
+        capture.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Print recorded raw port traffic")
+    parser.add_argument("files", nargs="+", help="capture files (.cap.gz)")
+    parser.add_argument("--hex", action="store_true", help="print data as hex instead of escaped text")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for path in args.files:
+        for wall_time, direction, data in read_capture(path):
+            stamp = time.strftime("%H:%M:%S", time.localtime(wall_time)) + f".{int(wall_time % 1 * 1e6):06d}"
+            text = data.hex(" ") if args.hex else repr(data)[2:-1]
+            print(f"{stamp} {DIRECTION_TAGS.get(direction, '?')} {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())